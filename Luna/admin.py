@@ -1,6 +1,16 @@
 from django.contrib import admin
 
-from Luna.models import HydroponicSystem, Reading
+from Luna.models import (
+    Alert,
+    AlertRule,
+    DailyRollup,
+    HourlyRollup,
+    HydroponicSystem,
+    Reading,
+    SystemState,
+)
+from Luna import ownership, response_cache
+from Luna.signals import readings_changed
 
 
 # Register your models here.
@@ -9,6 +19,44 @@ class HydroponicSystemAdmin(admin.ModelAdmin):
     pass
 
 
+# Deletes send no signal (post_delete would cost the fast delete), so what was
+# derived from the readings is recomputed here like in ReadingViewSet
 @admin.register(Reading)
 class ReadingAdmin(admin.ModelAdmin):
+    def delete_model(self, request, obj):
+        owner_ids = response_cache.owners_of([obj])
+        super().delete_model(request, obj)
+        readings_changed([obj.hydroponic_system_id], owner_ids)
+
+    def delete_queryset(self, request, queryset):
+        system_ids = set(
+            queryset.values_list("hydroponic_system_id", flat=True).distinct()
+        )
+        owner_ids = set(ownership.owners(system_ids).values())
+        super().delete_queryset(request, queryset)
+        readings_changed(system_ids, owner_ids)
+
+
+@admin.register(SystemState)
+class SystemStateAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(HourlyRollup)
+class HourlyRollupAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
     pass
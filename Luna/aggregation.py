@@ -0,0 +1,104 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Avg, Count, DateTimeField, F, Func, Max, Min, Sum, Value
+
+METRICS = ("temperature", "ph", "tds")
+AGGREGATES = {"avg": Avg, "min": Min, "max": Max}
+BUCKET_RE = re.compile(r"^(?P<size>\d+)(?P<unit>[smhd])$")
+BUCKET_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+# Buckets are aligned to a fixed origin so that consecutive requests for
+# overlapping ranges return the same bucket boundaries
+BUCKET_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class DateBin(Func):
+    function = "date_bin"
+    output_field = DateTimeField()
+
+    def __init__(self, stride, expression, origin=BUCKET_ORIGIN):
+        super().__init__(Value(stride), expression, Value(origin))
+
+
+def parse_bucket(value):
+    match = BUCKET_RE.match(value)
+    if not match or not int(match["size"]):
+        return None
+    return timedelta(**{BUCKET_UNITS[match["unit"]]: int(match["size"])})
+
+
+def _results(rows, aggregates, limit, prefix=""):
+    rows = rows.order_by(f"{prefix}bucket")
+    if limit is not None:
+        rows = rows[:limit]
+    return [
+        {
+            "bucket": row[f"{prefix}bucket"],
+            "count": row[f"{prefix}count"],
+            **{
+                metric: {name: row[f"{prefix}{metric}_{name}"] for name in aggregates}
+                for metric in METRICS
+            },
+        }
+        for row in rows
+    ]
+
+
+# Returns one row per non-empty bucket, computed by a single GROUP BY query
+def aggregate_readings(queryset, bucket, aggregates, limit=None):
+    annotations = {
+        f"{metric}_{name}": AGGREGATES[name](metric)
+        for metric in METRICS
+        for name in aggregates
+    }
+    rows = (
+        queryset.annotate(bucket=DateBin(bucket, "timestamp"))
+        .values("bucket")
+        .annotate(count=Count("id"), **annotations)
+    )
+    return _results(rows, aggregates, limit)
+
+
+# Same as aggregate_readings over hourly or daily rollups; ``bucket`` must be
+# a multiple of the rollup interval
+def aggregate_rollups(queryset, bucket, aggregates, limit=None):
+    rollup = {
+        "avg": lambda metric: Sum(F(f"{metric}_avg") * F("count")) / Sum("count"),
+        "min": lambda metric: Min(f"{metric}_min"),
+        "max": lambda metric: Max(f"{metric}_max"),
+    }
+    # Prefixed, the unprefixed names are fields of the rollup models
+    annotations = {
+        f"rollup_{metric}_{name}": rollup[name](metric)
+        for metric in METRICS
+        for name in aggregates
+    }
+    rows = (
+        queryset.annotate(rollup_bucket=DateBin(bucket, "bucket"))
+        .values("rollup_bucket")
+        .annotate(rollup_count=Sum("count"), **annotations)
+    )
+    return _results(rows, aggregates, limit, prefix="rollup_")
+
+
+def merge_buckets(*results):
+    merged = {}
+    for result in results:
+        for row in result:
+            current = merged.get(row["bucket"])
+            if current is None:
+                merged[row["bucket"]] = row
+                continue
+            count = current["count"] + row["count"]
+            for metric in METRICS:
+                values, other = current[metric], row[metric]
+                if "avg" in values:
+                    values["avg"] = (
+                        values["avg"] * current["count"] + other["avg"] * row["count"]
+                    ) / count
+                if "min" in values:
+                    values["min"] = min(values["min"], other["min"])
+                if "max" in values:
+                    values["max"] = max(values["max"], other["max"])
+            current["count"] = count
+    return [merged[bucket] for bucket in sorted(merged)]
@@ -0,0 +1,166 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DateTimeField, Value, When
+
+from .models import Alert, AlertRule
+
+# Rules are compiled into plain tuples, cached per system until one of the
+# system's rules changes:
+# (rule id, metric, min value, max value, max rate per second, sustained for)
+#
+# Every rule keeps its evaluation state in the cache:
+# (last timestamp, last value, violated since, open alert id)
+# Evaluating a batch takes two cache round trips and no query unless an alert
+# is raised or resolved.
+EMPTY_STATE = (None, None, None, None)
+
+
+def rules_key(system_id):
+    return f"luna:alert-rules:{system_id}"
+
+
+def state_key(rule_id):
+    return f"luna:alert-state:{rule_id}"
+
+
+def _compile(rule):
+    return (
+        rule.pk,
+        rule.metric,
+        rule.min_value,
+        rule.max_value,
+        None if rule.max_rate is None else rule.max_rate / 60,
+        rule.sustained_for,
+    )
+
+
+# Compiled rules of every system, cache misses are loaded with one query
+def compiled_rules(system_ids):
+    keys = {rules_key(system_id): system_id for system_id in system_ids}
+    compiled = {keys[key]: rules for key, rules in cache.get_many(keys).items()}
+
+    missing = [system_id for system_id in keys.values() if system_id not in compiled]
+    if missing:
+        loaded = {system_id: [] for system_id in missing}
+        for rule in AlertRule.objects.filter(
+            hydroponic_system__in=missing, is_active=True
+        ).order_by("pk"):
+            loaded[rule.hydroponic_system_id].append(_compile(rule))
+        cache.set_many(
+            {rules_key(system_id): rules for system_id, rules in loaded.items()},
+            settings.ALERT_RULES_CACHE_TIMEOUT,
+        )
+        compiled.update(loaded)
+    return compiled
+
+
+# A lost state is rebuilt from the rule's open alert, so recovery still
+# resolves it and a lasting violation doesn't raise it twice
+def _states(rule_ids):
+    keys = {state_key(rule_id): rule_id for rule_id in rule_ids}
+    states = {keys[key]: state for key, state in cache.get_many(keys).items()}
+
+    missing = [rule_id for rule_id in keys.values() if rule_id not in states]
+    if missing:
+        for rule_id in missing:
+            states[rule_id] = EMPTY_STATE
+        for alert_id, rule_id, started_at in Alert.objects.filter(
+            rule__in=missing, resolved_at=None
+        ).values_list("pk", "rule_id", "started_at"):
+            states[rule_id] = (None, None, started_at, alert_id)
+    return states
+
+
+def _violation(rule, value, timestamp, last_timestamp, last_value):
+    _, _, min_value, max_value, max_rate, _ = rule
+    if min_value is not None and value < min_value:
+        return "below"
+    if max_value is not None and value > max_value:
+        return "above"
+    if max_rate is not None and last_timestamp is not None:
+        seconds = (timestamp - last_timestamp).total_seconds()
+        if abs(value - last_value) > max_rate * seconds:
+            return "rate"
+    return None
+
+
+# Evaluates a batch of written readings against the rules of their systems,
+# in a single pass over every system's readings in timestamp order. Readings
+# older than the last one a rule has seen are ignored.
+def evaluate(readings):
+    by_system = defaultdict(list)
+    for reading in readings:
+        by_system[reading.hydroponic_system_id].append(reading)
+    rules = {
+        system_id: system_rules
+        for system_id, system_rules in compiled_rules(by_system).items()
+        if system_rules
+    }
+    if not rules:
+        return
+
+    states = _states(
+        rule[0] for system_rules in rules.values() for rule in system_rules
+    )
+    raised, resolved = [], {}
+    for system_id, system_rules in rules.items():
+        system_readings = sorted(by_system[system_id], key=lambda r: r.timestamp)
+        for rule in system_rules:
+            rule_id, metric, sustained_for = rule[0], rule[1], rule[5]
+            last_timestamp, last_value, since, alert = states[rule_id]
+            for reading in system_readings:
+                timestamp = reading.timestamp
+                if last_timestamp is not None and timestamp <= last_timestamp:
+                    continue
+                value = getattr(reading, metric)
+                reason = _violation(rule, value, timestamp, last_timestamp, last_value)
+                last_timestamp, last_value = timestamp, value
+                if reason is None:
+                    since = None
+                    if isinstance(alert, Alert):
+                        alert.resolved_at = timestamp
+                    elif alert is not None:
+                        resolved[alert] = timestamp
+                    alert = None
+                    continue
+                if since is None:
+                    since = timestamp
+                if alert is None and timestamp - since >= sustained_for:
+                    alert = Alert(
+                        rule_id=rule_id,
+                        hydroponic_system_id=system_id,
+                        reason=reason,
+                        value=value,
+                        started_at=since,
+                        triggered_at=timestamp,
+                    )
+                    raised.append(alert)
+            states[rule_id] = (last_timestamp, last_value, since, alert)
+
+    if raised:
+        Alert.objects.bulk_create(raised)
+    if resolved:
+        Alert.objects.filter(pk__in=resolved).update(
+            resolved_at=Case(
+                *[
+                    When(pk=alert_id, then=Value(timestamp))
+                    for alert_id, timestamp in resolved.items()
+                ],
+                output_field=DateTimeField(),
+            )
+        )
+    cache.set_many(
+        {
+            state_key(rule_id): state[:3]
+            + (state[3].pk if isinstance(state[3], Alert) else state[3],)
+            for rule_id, state in states.items()
+        },
+        settings.ALERT_RULES_CACHE_TIMEOUT,
+    )
+
+
+# A changed rule starts over, from its open alert if it has one
+def forget(rule):
+    cache.delete_many([rules_key(rule.hydroponic_system_id), state_key(rule.pk)])
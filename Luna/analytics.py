@@ -0,0 +1,152 @@
+import hashlib
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, router
+
+from . import response_cache
+from .aggregation import METRICS
+from .models import Reading
+
+# Readings are packed into a single bytea value by PostgreSQL, in binary send
+# format, and viewed as one structured array without a Python object per row.
+# Binary timestamps count microseconds from 2000-01-01.
+ROW_DTYPE = np.dtype([("timestamp", ">i8")] + [(metric, ">f8") for metric in METRICS])
+POSTGRES_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+# COPY would send every row as a message of its own, which costs more than the
+# statistics; one value of 32 bytes per reading is parsed in a single step.
+# A bytea is limited to 1 GB, some 30 million readings.
+PACK_SQL = """
+    SELECT string_agg(
+        timestamptz_send("timestamp") || {metrics}, '' ORDER BY "timestamp"
+    )
+    FROM {table}
+    WHERE hydroponic_system_id = %s
+        AND "timestamp" >= coalesce(%s::timestamptz, '-infinity')
+        AND "timestamp" <= coalesce(%s::timestamptz, 'infinity')
+""".format(
+    metrics=" || ".join(f"float8send({metric})" for metric in METRICS),
+    table=connection.ops.quote_name(Reading._meta.db_table),
+)
+PERCENTILES = (5, 25, 50, 75, 95)
+CORRELATIONS = (("ph", "tds"), ("temperature", "ph"), ("temperature", "tds"))
+
+
+# Returns the timestamps (int64 microseconds since POSTGRES_EPOCH) and every
+# metric (float64) of the system's readings in [start, end] as contiguous
+# arrays, oldest first
+def load_arrays(system_id, start=None, end=None):
+    with connections[router.db_for_read(Reading)].cursor() as cursor:
+        cursor.execute(PACK_SQL, [system_id, start, end])
+        packed = cursor.fetchone()[0] or b""
+    rows = np.frombuffer(packed, ROW_DTYPE)
+    arrays = {"timestamp": rows["timestamp"].astype(np.int64)}
+    for metric in METRICS:
+        arrays[metric] = rows[metric].astype(np.float64)
+    return arrays
+
+
+def _number(value):
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+# Rolling mean and standard deviation over the readings of the ``window``
+# microseconds up to and including each of the readings at ``indices``, from
+# cumulative sums. Values are centered first to keep the sums of squares
+# accurate.
+def rolling(timestamps, values, window, indices):
+    starts = np.searchsorted(timestamps, timestamps[indices] - window, side="right")
+    ends = indices + 1
+    mean = values.mean()
+    centered = values - mean
+    sums = np.concatenate(([0.0], np.cumsum(centered)))
+    squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    counts = ends - starts
+    means = (sums[ends] - sums[starts]) / counts
+    variances = (squares[ends] - squares[starts]) / counts - means * means
+    return means + mean, np.sqrt(np.maximum(variances, 0.0))
+
+
+def compute(arrays, window, points):
+    timestamps = arrays["timestamp"]
+    count = len(timestamps)
+    result = {
+        "count": count,
+        "window_seconds": int(window.total_seconds()),
+        "metrics": {},
+    }
+    if not count:
+        result.update(correlations={}, rolling=[])
+        return result
+
+    for metric in METRICS:
+        values = arrays[metric]
+        result["metrics"][metric] = {
+            "mean": _number(values.mean()),
+            "std": _number(values.std()),
+            "min": _number(values.min()),
+            "max": _number(values.max()),
+            "percentiles": {
+                f"p{percentile}": _number(value)
+                for percentile, value in zip(
+                    PERCENTILES, np.percentile(values, PERCENTILES)
+                )
+            },
+        }
+
+    correlations = {}
+    for first, second in CORRELATIONS:
+        if count < 2:
+            correlations[f"{first}_{second}"] = None
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value = np.corrcoef(arrays[first], arrays[second])[0, 1]
+        correlations[f"{first}_{second}"] = _number(value)
+    result["correlations"] = correlations
+
+    # At up to ``points`` evenly spaced readings
+    selected = np.unique(np.linspace(0, count - 1, min(points, count)).astype(np.int64))
+    window_us = window // timedelta(microseconds=1)
+    windows = {
+        metric: rolling(timestamps, arrays[metric], window_us, selected)
+        for metric in METRICS
+    }
+    result["rolling"] = [
+        {
+            "timestamp": POSTGRES_EPOCH
+            + timedelta(microseconds=int(timestamps[index])),
+            **{
+                metric: {
+                    "mean": _number(windows[metric][0][position]),
+                    "std": _number(windows[metric][1][position]),
+                }
+                for metric in METRICS
+            },
+        }
+        for position, index in enumerate(selected)
+    ]
+    return result
+
+
+def cache_key(system, start, end, window, points):
+    params = f"{start}:{end}:{window}:{points}"
+    digest = hashlib.md5(params.encode(), usedforsecurity=False).hexdigest()
+    # The owner's version changes with every write to their readings
+    version = response_cache.version(system.owner_id)
+    return f"luna:analytics:{system.pk}:{version}:{digest}"
+
+
+# Statistics of the system's readings in [start, end] with rolling values over
+# ``window`` (a timedelta) at up to ``points`` readings. Cached per system and
+# time window until one of the owner's readings changes.
+def analyze(system, window, points, start=None, end=None):
+    key = cache_key(system, start, end, window, points)
+    result = cache.get(key)
+    if result is None:
+        result = compute(load_arrays(system.pk, start, end), window, points)
+        cache.set(key, result, settings.READINGS_ANALYTICS_CACHE_TIMEOUT)
+    return result
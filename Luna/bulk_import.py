@@ -0,0 +1,136 @@
+import csv
+import json
+import math
+import time
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import latest_readings, response_cache, system_state
+from .models import HydroponicSystem, Reading
+
+FORMATS = ("csv", "ndjson")
+COLUMNS = ("hydroponic_system_id", "temperature", "ph", "tds", "timestamp")
+TYPES = ("bigint", "float8", "float8", "float8", "timestamptz")
+STAGING_TABLE = "reading_import"
+# COPY cannot skip conflicting rows, so files are copied into a temporary
+# table first and moved over with ON CONFLICT DO NOTHING
+CREATE_STAGING_SQL = f"""
+    CREATE TEMPORARY TABLE {STAGING_TABLE} (
+        hydroponic_system_id bigint,
+        temperature float8,
+        ph float8,
+        tds float8,
+        "timestamp" timestamptz
+    ) ON COMMIT DROP
+"""
+COPY_SQL = f"COPY {STAGING_TABLE} FROM STDIN (FORMAT BINARY)"
+MOVE_SQL = """
+    INSERT INTO {table} ({columns})
+    SELECT {columns} FROM {staging}
+    ON CONFLICT (hydroponic_system_id, "timestamp") DO NOTHING
+""".format(
+    table=connection.ops.quote_name(Reading._meta.db_table),
+    columns=", ".join(connection.ops.quote_name(column) for column in COLUMNS),
+    staging=STAGING_TABLE,
+)
+PROGRESS_EVERY = 100_000
+
+
+class ReadingImportError(Exception):
+    pass
+
+
+def detect_format(path):
+    suffix = Path(path).suffix.lstrip(".").lower()
+    if suffix in ("json", "jsonl"):
+        return "ndjson"
+    if suffix not in FORMATS:
+        raise ReadingImportError(f"{path}: cannot tell the format from the extension.")
+    return suffix
+
+
+# Yields (line number, record) pairs. Both formats use the export column
+# names, extra columns such as ``id`` are ignored.
+def read_records(path, fmt):
+    with open(path, newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                raise ReadingImportError(f"{path}:{line}: invalid JSON.")
+
+
+def parse_record(record, owned):
+    try:
+        system_id = int(record["hydroponic_system"])
+        values = [float(record[field]) for field in ("temperature", "ph", "tds")]
+        timestamp = parse_datetime(record["timestamp"])
+    except KeyError as exc:
+        raise ValueError(f"missing {exc}.")
+    except TypeError:
+        raise ValueError("expected an object with reading fields.")
+    if timestamp is None:
+        raise ValueError(f'invalid timestamp "{record["timestamp"]}".')
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError("values must be finite numbers.")
+    if system_id not in owned:
+        raise ValueError(f'hydroponic system "{system_id}" does not exist.')
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return (system_id, *values, timestamp)
+
+
+# Streams one file into the readings table with COPY, inside one transaction,
+# so a file is either loaded completely or not at all. Only systems of
+# ``owner_id`` are accepted. ``progress(rows, seconds)`` is called every
+# PROGRESS_EVERY rows.
+def import_file(path, owner_id, fmt=None, skip_invalid=False, progress=None):
+    fmt = fmt or detect_format(path)
+    owned = set(
+        HydroponicSystem.objects.filter(owner_id=owner_id).values_list("pk", flat=True)
+    )
+    rows = skipped = 0
+    systems = set()
+    start = time.monotonic()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_SQL)
+        with cursor.copy(COPY_SQL) as copy:
+            copy.set_types(TYPES)
+            for line, record in read_records(path, fmt):
+                try:
+                    row = parse_record(record, owned)
+                except ValueError as exc:
+                    if not skip_invalid:
+                        raise ReadingImportError(f"{path}:{line}: {exc}")
+                    skipped += 1
+                    continue
+                copy.write_row(row)
+                systems.add(row[0])
+                rows += 1
+                if progress is not None and rows % PROGRESS_EVERY == 0:
+                    progress(rows, time.monotonic() - start)
+        cursor.execute(MOVE_SQL)
+        duplicates = rows - cursor.rowcount
+        # COPY bypasses readings_written, so derived data is rebuilt per file
+        system_state.refresh(systems)
+    latest_readings.forget(systems)
+    response_cache.bump([owner_id])
+
+    return {
+        "path": str(path),
+        "rows": rows - duplicates,
+        "duplicates": duplicates,
+        "skipped": skipped,
+        "seconds": time.monotonic() - start,
+    }
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from . import ownership
+from .models import Reading
+from .seliarizers import BulkReadingSerializer
+from .signals import readings_written
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+QUEUED = "queued"
+INVALID = "invalid"
+
+# One statement per batch, whatever its size. Readings already stored for the
+# same system and timestamp are skipped, RETURNING only yields the new ones.
+INSERT_SQL = """
+    INSERT INTO {table} (hydroponic_system_id, temperature, ph, tds, "timestamp")
+    SELECT * FROM unnest(
+        %s::bigint[], %s::float8[], %s::float8[], %s::float8[], %s::timestamptz[]
+    )
+    ON CONFLICT (hydroponic_system_id, "timestamp") DO NOTHING
+    RETURNING id, hydroponic_system_id, "timestamp"
+""".format(
+    table=connection.ops.quote_name(Reading._meta.db_table)
+)
+
+
+# Rows are validated independently so a bad row never rejects the rest of the
+# batch. Returns one result per input row, in input order, with ``None`` for
+# valid rows, and the (index, unsaved Reading) pairs of the valid ones.
+def validate_readings(rows, owner):
+    results = [None] * len(rows)
+    serializer = BulkReadingSerializer()
+    pending = []
+
+    for index, row in enumerate(rows):
+        try:
+            pending.append((index, serializer.run_validation(row)))
+        except ValidationError as exc:
+            results[index] = {"index": index, "status": INVALID, "errors": exc.detail}
+
+    system_ids = {data["hydroponic_system"] for _, data in pending}
+    systems = ownership.owned_systems(owner.pk, system_ids)
+
+    readings = []
+    for index, data in pending:
+        system = systems.get(data["hydroponic_system"])
+        if system is None:
+            results[index] = {
+                "index": index,
+                "status": INVALID,
+                "errors": {
+                    "hydroponic_system": [
+                        f'Invalid pk "{data["hydroponic_system"]}" - '
+                        "object does not exist."
+                    ]
+                },
+            }
+            continue
+        data["hydroponic_system"] = system
+        readings.append((index, Reading(**data)))
+
+    return results, readings
+
+
+def _insert(readings):
+    columns = [[], [], [], [], []]
+    for reading in readings:
+        for column, value in zip(
+            columns,
+            (
+                reading.hydroponic_system_id,
+                reading.temperature,
+                reading.ph,
+                reading.tds,
+                reading.timestamp,
+            ),
+        ):
+            column.append(value)
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_SQL, columns)
+        inserted = {(system_id, timestamp): pk for pk, system_id, timestamp in cursor}
+
+    # Within a batch only the first copy of a reading is stored
+    created = []
+    for reading in readings:
+        pk = inserted.pop((reading.hydroponic_system_id, reading.timestamp), None)
+        if pk is not None:
+            reading.pk = pk
+            reading._state.adding = False
+            created.append(reading)
+    return created
+
+
+# Every write path ends here so readings_written fires once per batch. Returns
+# the readings that were stored, duplicates keep ``pk`` None.
+def write_readings(readings):
+    created = []
+    batch_size = settings.READINGS_BULK_BATCH_SIZE
+    for start in range(0, len(readings), batch_size):
+        batch = _insert(readings[start : start + batch_size])
+        if batch:
+            readings_written.send(sender=Reading, readings=batch)
+        created += batch
+    return created
+
+
+def ingest_readings(rows, owner):
+    results, readings = validate_readings(rows, owner)
+    write_readings([reading for _, reading in readings])
+    for index, reading in readings:
+        if reading.pk is None:
+            results[index] = {"index": index, "status": DUPLICATE}
+        else:
+            results[index] = {"index": index, "status": CREATED, "id": reading.pk}
+    return results
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, router
+
+from .models import Reading
+
+# Readings are cached as plain tuples, newest first, to keep entries small
+FIELDS = ("id", "hydroponic_system_id", "temperature", "ph", "tds", "timestamp")
+# One index scan of reading_system_ts_unique per system, stopping after the
+# latest rows. A window function over the systems would read and sort every
+# reading of them first.
+LOAD_SQL = """
+    SELECT {columns}
+    FROM unnest(%s::bigint[]) AS system(id)
+    CROSS JOIN LATERAL (
+        SELECT {fields}
+        FROM {table}
+        WHERE hydroponic_system_id = system.id
+        ORDER BY "timestamp" DESC
+        LIMIT %s
+    ) AS latest
+""".format(
+    columns=", ".join(f"latest.{connection.ops.quote_name(field)}" for field in FIELDS),
+    fields=", ".join(connection.ops.quote_name(field) for field in FIELDS),
+    table=connection.ops.quote_name(Reading._meta.db_table),
+)
+
+
+def cache_key(system_id):
+    return f"luna:latest-readings:{system_id}"
+
+
+def _sort_key(row):
+    return row[5], row[0]
+
+
+def _to_reading(row):
+    return Reading(**dict(zip(FIELDS, row)))
+
+
+def _load(system_ids):
+    with connections[router.db_for_read(Reading)].cursor() as cursor:
+        cursor.execute(LOAD_SQL, [list(system_ids), settings.LATEST_READINGS_COUNT])
+        rows = cursor.fetchall()
+    loaded = {system_id: [] for system_id in system_ids}
+    for row in rows:
+        loaded[row[1]].append(row)
+    for system_rows in loaded.values():
+        system_rows.sort(key=_sort_key, reverse=True)
+    return loaded
+
+
+# Returns the latest readings of every system, newest first. Cache misses for
+# any number of systems are filled with a single query.
+def get_many(system_ids):
+    system_ids = list(system_ids)
+    keys = {cache_key(system_id): system_id for system_id in system_ids}
+    cached = {keys[key]: rows for key, rows in cache.get_many(keys).items()}
+
+    missing = [system_id for system_id in system_ids if system_id not in cached]
+    if missing:
+        loaded = _load(missing)
+        cache.set_many(
+            {cache_key(system_id): rows for system_id, rows in loaded.items()},
+            settings.LATEST_READINGS_CACHE_TIMEOUT,
+        )
+        cached.update(loaded)
+
+    return {
+        system_id: [_to_reading(row) for row in cached[system_id]]
+        for system_id in system_ids
+    }
+
+
+# Merges freshly written readings into the cached ring buffers. Systems that
+# are not cached are left alone, the next read loads them from the database.
+def push(readings):
+    new_rows = defaultdict(dict)
+    for reading in readings:
+        new_rows[reading.hydroponic_system_id][reading.pk] = tuple(
+            getattr(reading, field) for field in FIELDS
+        )
+
+    keys = {cache_key(system_id): system_id for system_id in new_rows}
+    updated = {}
+    for key, rows in cache.get_many(keys).items():
+        merged = {row[0]: row for row in rows}
+        merged.update(new_rows[keys[key]])
+        updated[key] = sorted(merged.values(), key=_sort_key, reverse=True)[
+            : settings.LATEST_READINGS_COUNT
+        ]
+    cache.set_many(updated, settings.LATEST_READINGS_CACHE_TIMEOUT)
+
+
+def forget(system_ids):
+    cache.delete_many([cache_key(system_id) for system_id in system_ids])
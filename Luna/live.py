@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+import psycopg
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+
+from .response_cache import system_owners
+from .seliarizers import ReadingValuesSerializer
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "luna_readings"
+# NOTIFY payloads must stay below 8000 bytes
+NOTIFY_BATCH_SIZE = 40
+TICKET_SALT = "luna.readings.stream"
+
+
+# Short-lived signed user id to open a stream with. EventSource cannot send
+# headers, and a ticket in the URL (and so in access logs) is worthless after
+# READINGS_STREAM_TICKET_MAX_AGE, unlike the API token.
+def issue_ticket(user_id):
+    return signing.dumps(user_id, salt=TICKET_SALT)
+
+
+# The user id of a ticket, raises signing.BadSignature when it is invalid or
+# expired
+def ticket_user_id(ticket):
+    return signing.loads(
+        ticket, salt=TICKET_SALT, max_age=settings.READINGS_STREAM_TICKET_MAX_AGE
+    )
+
+
+class Subscription:
+    def __init__(self, owner_id, system_ids, loop):
+        self.owner_id = owner_id
+        self.system_ids = system_ids
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.READINGS_STREAM_QUEUE_SIZE)
+
+    # Runs on the subscriber's event loop. A client that cannot keep up is
+    # disconnected rather than buffered without bound; EventSource reconnects.
+    def deliver(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Broadcaster:
+    # Fans readings out to the subscriptions of this process. Publishers may
+    # run in any thread, every subscription is fed on its own event loop.
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, owner_id, system_ids=None, loop=None):
+        subscription = Subscription(
+            owner_id, system_ids, loop or asyncio.get_running_loop()
+        )
+        with self.lock:
+            self.subscriptions[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            owner_subscriptions = self.subscriptions.get(subscription.owner_id, set())
+            owner_subscriptions.discard(subscription)
+            if not owner_subscriptions:
+                self.subscriptions.pop(subscription.owner_id, None)
+
+    def owner_ids(self):
+        with self.lock:
+            return set(self.subscriptions)
+
+    # ``rows`` are serialized readings of the owner's systems
+    def dispatch(self, owner_id, rows):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(owner_id, ()))
+        encoded = None
+        for subscription in subscriptions:
+            if subscription.system_ids is None:
+                if encoded is None:
+                    encoded = json.dumps(rows, separators=(",", ":"))
+                data = encoded
+            else:
+                selected = [
+                    row
+                    for row in rows
+                    if row["hydroponic_system"] in subscription.system_ids
+                ]
+                if not selected:
+                    continue
+                data = json.dumps(selected, separators=(",", ":"))
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, data)
+            except RuntimeError:
+                # Its event loop is gone, so is the client
+                self.unsubscribe(subscription)
+
+
+broadcaster = Broadcaster()
+
+
+def _rows_by_owner(readings, owner_ids=None):
+    owners = system_owners(readings)
+    by_owner = defaultdict(list)
+    for reading in readings:
+        owner_id = owners[reading.hydroponic_system_id]
+        if owner_ids is None or owner_id in owner_ids:
+            by_owner[owner_id].append(
+                {
+                    "id": reading.pk,
+                    "hydroponic_system": reading.hydroponic_system_id,
+                    "temperature": reading.temperature,
+                    "ph": reading.ph,
+                    "tds": reading.tds,
+                    "timestamp": reading.timestamp,
+                }
+            )
+    return {
+        owner_id: ReadingValuesSerializer(rows, many=True).data
+        for owner_id, rows in by_owner.items()
+    }
+
+
+def _dispatch_all(events):
+    for owner_id, rows in events.items():
+        broadcaster.dispatch(owner_id, rows)
+
+
+# Pushes written readings to subscribers once the transaction commits. With
+# the postgres backend they travel through NOTIFY, which PostgreSQL delivers on
+# commit, to the listener of every worker process.
+def publish(readings):
+    if settings.READINGS_STREAM_BACKEND == "postgres":
+        payloads = [
+            json.dumps(
+                {"owner": owner_id, "readings": rows[start : start + NOTIFY_BATCH_SIZE]}
+            )
+            for owner_id, rows in _rows_by_owner(readings).items()
+            for start in range(0, len(rows), NOTIFY_BATCH_SIZE)
+        ]
+        with connection.cursor() as cursor:
+            for payload in payloads:
+                cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+        return
+
+    # Nobody listening in this process, nothing to serialize
+    owner_ids = broadcaster.owner_ids()
+    if not owner_ids:
+        return
+    events = _rows_by_owner(readings, owner_ids)
+    if events:
+        transaction.on_commit(lambda: _dispatch_all(events))
+
+
+class Listener:
+    # LISTENs on a dedicated connection in a background thread and hands
+    # notifications to the broadcaster. Reconnects after connection errors.
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.listening = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.stopping.clear()
+            self.thread = threading.Thread(
+                target=self.run, name="reading-listener", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        self.stopping.set()
+        if thread is not None:
+            thread.join()
+
+    def run(self):
+        params = connection.get_connection_params()
+        while not self.stopping.is_set():
+            try:
+                with psycopg.connect(**params, autocommit=True) as listen_connection:
+                    listen_connection.execute(f"LISTEN {CHANNEL}")
+                    self.listening.set()
+                    while not self.stopping.is_set():
+                        for notify in listen_connection.notifies(timeout=1):
+                            event = json.loads(notify.payload)
+                            broadcaster.dispatch(event["owner"], event["readings"])
+            except psycopg.Error:
+                logger.exception("Reading listener lost its connection")
+                self.stopping.wait(1)
+            finally:
+                self.listening.clear()
+
+
+listener = Listener()
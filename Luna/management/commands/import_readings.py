@@ -0,0 +1,157 @@
+import multiprocessing
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from Luna.bulk_import import FORMATS, ReadingImportError, import_file
+
+
+def import_in_worker(path, owner_id, fmt, skip_invalid, messages):
+    def progress(rows, seconds):
+        messages.put((path, rows, seconds))
+
+    try:
+        return import_file(
+            path, owner_id, fmt=fmt, skip_invalid=skip_invalid, progress=progress
+        )
+    finally:
+        connections.close_all()
+
+
+def rate(rows, seconds):
+    return f"{rows / seconds:,.0f} rows/s" if seconds else "- rows/s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load readings from CSV or NDJSON files with PostgreSQL COPY. Files use "
+        "the columns of the readings export; every file is loaded in its own "
+        "transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="CSV or NDJSON files.")
+        parser.add_argument(
+            "--owner",
+            required=True,
+            help="Username owning every hydroponic system in the files.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, detected from the extension by default.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of files loaded in parallel, one process each.",
+        )
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="Skip invalid rows instead of rejecting the whole file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["owner"]}" does not exist.')
+
+        start = time.monotonic()
+        paths = options["paths"]
+        workers = min(options["workers"], len(paths))
+        jobs = [
+            (path, owner.pk, options["format"], options["skip_invalid"])
+            for path in paths
+        ]
+        if workers == 1:
+            results, errors = self.run_serial(jobs)
+        else:
+            results, errors = self.run_parallel(jobs, workers)
+
+        rows = sum(result["rows"] for result in results)
+        seconds = time.monotonic() - start
+        for error in errors:
+            self.stderr.write(str(error))
+        if errors:
+            raise CommandError(
+                f"{len(errors)} of {len(paths)} files failed, {rows} rows imported."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {rows} readings from {len(paths)} files "
+                f"({rate(rows, seconds)})."
+            )
+        )
+
+    def progress(self, path, rows, seconds):
+        self.stdout.write(f"{path}: {rows} rows ({rate(rows, seconds)})")
+
+    def done(self, result):
+        message = (
+            f"{result['path']}: imported {result['rows']} rows in "
+            f"{result['seconds']:.1f}s ({rate(result['rows'], result['seconds'])})"
+        )
+        if result["duplicates"]:
+            message += f", skipped {result['duplicates']} duplicates"
+        if result["skipped"]:
+            message += f", skipped {result['skipped']} invalid rows"
+        self.stdout.write(message)
+
+    def run_serial(self, jobs):
+        results, errors = [], []
+        for path, owner_id, fmt, skip_invalid in jobs:
+            try:
+                result = import_file(
+                    path,
+                    owner_id,
+                    fmt=fmt,
+                    skip_invalid=skip_invalid,
+                    progress=lambda rows, seconds: self.progress(path, rows, seconds),
+                )
+            except (ReadingImportError, OSError) as exc:
+                errors.append(exc)
+                continue
+            results.append(result)
+            self.done(result)
+        return results, errors
+
+    def run_parallel(self, jobs, workers):
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        results, errors = [], []
+        with (
+            context.Manager() as manager,
+            ProcessPoolExecutor(workers, mp_context=context) as pool,
+        ):
+            messages = manager.Queue()
+            pending = {pool.submit(import_in_worker, *job, messages) for job in jobs}
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                self.drain(messages)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except (ReadingImportError, OSError) as exc:
+                        errors.append(exc)
+                        continue
+                    results.append(result)
+                    self.done(result)
+            self.drain(messages)
+        return results, errors
+
+    def drain(self, messages):
+        while True:
+            try:
+                self.progress(*messages.get_nowait())
+            except queue.Empty:
+                return
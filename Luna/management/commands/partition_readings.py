@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Luna import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain monthly range partitions of the readings table: create "
+        "partitions ahead of time and detach the ones past retention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Convert the readings table to a partitioned table first. "
+            "Rewrites every row and locks the table while it runs.",
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Number of future months to create partitions for.",
+        )
+        parser.add_argument(
+            "--retain",
+            type=int,
+            default=None,
+            help="Detach partitions older than this many months.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop detached partitions instead of keeping them as tables.",
+        )
+
+    def handle(self, *args, **options):
+        if options["ahead"] < 0:
+            raise CommandError("--ahead must not be negative.")
+        if options["retain"] is not None and options["retain"] < 0:
+            raise CommandError("--retain must not be negative.")
+
+        if options["convert"]:
+            if partitioning.is_partitioned():
+                raise CommandError(f"{partitioning.TABLE} is already partitioned.")
+            months = partitioning.convert_to_partitioned()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Converted {partitioning.TABLE} with {len(months)} "
+                    "monthly partitions of existing data."
+                )
+            )
+        elif not partitioning.is_partitioned():
+            raise CommandError(
+                f"{partitioning.TABLE} is not partitioned, run with --convert first."
+            )
+
+        current = partitioning.month_start(timezone.now())
+        created = partitioning.create_partitions(
+            current, partitioning.add_months(current, options["ahead"])
+        )
+        for name in created:
+            self.stdout.write(f"Created partition {name}")
+
+        if options["retain"] is not None:
+            detached = partitioning.detach_partitions(
+                partitioning.add_months(current, -options["retain"]),
+                drop=options["drop"],
+            )
+            verb = "Dropped" if options["drop"] else "Detached"
+            for name in detached:
+                self.stdout.write(f"{verb} partition {name}")
+
+        self.stdout.write(self.style.SUCCESS("Partitions are up to date."))
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Luna import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll readings older than the retention window up into hourly and daily "
+        "summaries and remove the raw rows in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retain-days",
+            type=int,
+            default=settings.READINGS_RAW_RETENTION_DAYS,
+            help="Keep raw readings of this many days.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.READINGS_ROLLUP_BATCH_SIZE,
+            help="Number of readings rolled up and deleted per statement.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop rolled up monthly partitions instead of detaching them.",
+        )
+
+    def handle(self, *args, **options):
+        if options["retain_days"] < 1:
+            raise CommandError("--retain-days must be at least 1.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        cutoff = timezone.now() - timedelta(days=options["retain_days"])
+        total = 0
+        for rows in rollups.roll_up(
+            cutoff, options["batch_size"], drop=options["drop"]
+        ):
+            total += rows
+            if rows:
+                self.stdout.write(f"Rolled up {total} readings")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled up {total} readings older than {cutoff:%Y-%m-%d %H:%M}."
+            )
+        )
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:14
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Building the indexes concurrently keeps the readings table writable
+    atomic = False
+
+    dependencies = [
+        ("Luna", "0002_alter_reading_hydroponic_system"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="reading",
+            index=models.Index(
+                fields=["hydroponic_system", "-timestamp"], name="reading_system_ts_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="reading",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["timestamp"], name="reading_ts_brin_idx"
+            ),
+        ),
+        # The composite index above covers lookups by system on its own
+        migrations.AlterField(
+            model_name="reading",
+            name="hydroponic_system",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="readings",
+                to="Luna.hydroponicsystem",
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Luna", "0003_reading_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SystemState",
+            fields=[
+                (
+                    "hydroponic_system",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="state",
+                        serialize=False,
+                        to="Luna.hydroponicsystem",
+                    ),
+                ),
+                ("temperature", models.FloatField()),
+                ("ph", models.FloatField()),
+                ("tds", models.FloatField()),
+                ("last_seen", models.DateTimeField()),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO "Luna_systemstate"
+                    (hydroponic_system_id, temperature, ph, tds, last_seen)
+                SELECT DISTINCT ON (hydroponic_system_id)
+                    hydroponic_system_id, temperature, ph, tds, "timestamp"
+                FROM "Luna_reading"
+                ORDER BY hydroponic_system_id, "timestamp" DESC, id DESC
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Keeps the first stored copy of every (system, timestamp) pair
+DELETE_DUPLICATES_SQL = """
+    DELETE FROM "Luna_reading" duplicate
+    USING "Luna_reading" original
+    WHERE duplicate.hydroponic_system_id = original.hydroponic_system_id
+        AND duplicate."timestamp" = original."timestamp"
+        AND duplicate.id > original.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Luna", "0004_systemstate"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATES_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name="reading",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name="reading",
+            constraint=models.UniqueConstraint(
+                fields=("hydroponic_system", "timestamp"),
+                name="reading_system_ts_unique",
+            ),
+        ),
+        # The unique index covers the same lookups, scanned backwards
+        migrations.RemoveIndex(
+            model_name="reading",
+            name="reading_system_ts_idx",
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Luna", "0005_reading_timestamp_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField()),
+                ("temperature_min", models.FloatField()),
+                ("temperature_max", models.FloatField()),
+                ("temperature_avg", models.FloatField()),
+                ("ph_min", models.FloatField()),
+                ("ph_max", models.FloatField()),
+                ("ph_avg", models.FloatField()),
+                ("tds_min", models.FloatField()),
+                ("tds_max", models.FloatField()),
+                ("tds_avg", models.FloatField()),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="Luna.hydroponicsystem",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("hydroponic_system", "bucket"),
+                        name="daily_rollup_system_bucket_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="HourlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField()),
+                ("temperature_min", models.FloatField()),
+                ("temperature_max", models.FloatField()),
+                ("temperature_avg", models.FloatField()),
+                ("ph_min", models.FloatField()),
+                ("ph_max", models.FloatField()),
+                ("ph_avg", models.FloatField()),
+                ("tds_min", models.FloatField()),
+                ("tds_max", models.FloatField()),
+                ("tds_avg", models.FloatField()),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="Luna.hydroponicsystem",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("hydroponic_system", "bucket"),
+                        name="hourly_rollup_system_bucket_unique",
+                    )
+                ],
+            },
+        ),
+    ]
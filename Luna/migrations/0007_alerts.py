@@ -0,0 +1,107 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:40
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Luna", "0006_reading_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("temperature", "Temperature"),
+                            ("ph", "pH"),
+                            ("tds", "TDS"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("min_value", models.FloatField(blank=True, null=True)),
+                ("max_value", models.FloatField(blank=True, null=True)),
+                ("max_rate", models.FloatField(blank=True, null=True)),
+                ("sustained_for", models.DurationField(default=datetime.timedelta(0))),
+                ("is_active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_rules",
+                        to="Luna.hydroponicsystem",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Alert",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("below", "Below minimum"),
+                            ("above", "Above maximum"),
+                            ("rate", "Changing too fast"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("value", models.FloatField()),
+                ("started_at", models.DateTimeField()),
+                ("triggered_at", models.DateTimeField()),
+                ("resolved_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alerts",
+                        to="Luna.hydroponicsystem",
+                    ),
+                ),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alerts",
+                        to="Luna.alertrule",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["hydroponic_system", "-triggered_at"],
+                        name="alert_system_triggered_idx",
+                    )
+                ],
+            },
+        ),
+    ]
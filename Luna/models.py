@@ -1,5 +1,9 @@
-from django.db import models
+from datetime import timedelta
+
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import models
+from django.utils import timezone
 
 
 # Create your models here.
@@ -10,6 +14,14 @@ class HydroponicSystem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Remembers the owner the system was loaded with, so a change of owner
+    # invalidates the previous owner's responses too, see Luna.signals
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_owner_id = instance.__dict__.get("owner_id")
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -18,13 +30,165 @@ class HydroponicSystem(models.Model):
 # as it looks like some sensor data but it was specified to use postgresql
 # but influx does not have django ORM support
 class Reading(models.Model):
+    # Indexed through the leading column of reading_system_ts_unique
     hydroponic_system = models.ForeignKey(
-        HydroponicSystem, on_delete=models.CASCADE, related_name="readings"
+        HydroponicSystem,
+        on_delete=models.CASCADE,
+        related_name="readings",
+        db_index=False,
     )
     temperature = models.FloatField()
     ph = models.FloatField()
     tds = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Measurement time sent by the device, arrival time if it sends none
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # A device replaying its buffer sends the same readings again, the
+            # write paths skip them with ON CONFLICT DO NOTHING. The index also
+            # serves per-system "latest N" lookups and time-bounded scans
+            # without sorting.
+            models.UniqueConstraint(
+                fields=["hydroponic_system", "timestamp"],
+                name="reading_system_ts_unique",
+            ),
+        ]
+        indexes = [
+            # Readings are appended in time order, so a BRIN index stays tiny
+            # while still pruning most blocks for range queries over all systems
+            BrinIndex(fields=["timestamp"], name="reading_ts_brin_idx"),
+        ]
+
+    # Remembers the system the reading was loaded with, so an edit moving it
+    # to another system can update both, see Luna.signals.reading_saved
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_system_id = instance.__dict__.get("hydroponic_system_id")
+        return instance
 
     def __str__(self):
         return f"{self.hydroponic_system.name} - {self.timestamp}"
+
+
+# Denormalized latest reading of every system, upserted on each write so that
+# fleet views never have to scan the readings table
+class SystemState(models.Model):
+    hydroponic_system = models.OneToOneField(
+        HydroponicSystem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="state",
+    )
+    temperature = models.FloatField()
+    ph = models.FloatField()
+    tds = models.FloatField()
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.hydroponic_system_id} - {self.last_seen}"
+
+
+# Hourly and daily summaries of readings past the raw retention window, see
+# Luna.rollups
+class ReadingRollup(models.Model):
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+    )
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_avg = models.FloatField()
+    ph_min = models.FloatField()
+    ph_max = models.FloatField()
+    ph_avg = models.FloatField()
+    tds_min = models.FloatField()
+    tds_max = models.FloatField()
+    tds_avg = models.FloatField()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.hydroponic_system_id} - {self.bucket}"
+
+
+class HourlyRollup(ReadingRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hydroponic_system", "bucket"],
+                name="hourly_rollup_system_bucket_unique",
+            ),
+        ]
+
+
+class DailyRollup(ReadingRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hydroponic_system", "bucket"],
+                name="daily_rollup_system_bucket_unique",
+            ),
+        ]
+
+
+class AlertRule(models.Model):
+    METRIC_CHOICES = [
+        ("temperature", "Temperature"),
+        ("ph", "pH"),
+        ("tds", "TDS"),
+    ]
+
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name="alert_rules"
+    )
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    # Any of the conditions may be left out
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    # Largest allowed change per minute between two consecutive readings
+    max_rate = models.FloatField(null=True, blank=True)
+    # How long a violation must last before an alert is raised
+    sustained_for = models.DurationField(default=timedelta(0))
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.hydroponic_system.name} - {self.metric}"
+
+
+class Alert(models.Model):
+    REASON_CHOICES = [
+        ("below", "Below minimum"),
+        ("above", "Above maximum"),
+        ("rate", "Changing too fast"),
+    ]
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name="alerts")
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name="alerts"
+    )
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    # Value of the reading that raised the alert. Readings are not referenced
+    # by key since the readings table may be partitioned.
+    value = models.FloatField()
+    started_at = models.DateTimeField()
+    triggered_at = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["hydroponic_system", "-triggered_at"],
+                name="alert_system_triggered_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.rule} - {self.reason} - {self.triggered_at}"
@@ -0,0 +1,41 @@
+from .models import HydroponicSystem
+
+
+# Maps the systems to their owners' ids, leaving out unknown ones
+def owners(system_ids):
+    return dict(
+        HydroponicSystem.objects.filter(pk__in=set(system_ids)).values_list(
+            "pk", "owner_id"
+        )
+    )
+
+
+# Unsaved stand-ins for the systems of ``system_ids`` that belong to
+# ``owner_id``, by primary key. Enough to write readings or rules for them
+# and to tell their owner, see response_cache.system_owners.
+def owned_systems(owner_id, system_ids):
+    return {
+        system_id: HydroponicSystem(pk=system_id, owner_id=owner_id)
+        for system_id in HydroponicSystem.objects.filter(
+            pk__in=set(system_ids), owner_id=owner_id
+        ).values_list("pk", flat=True)
+    }
+
+
+# Same as owned_systems for the user of ``request``. The ids of all the user's
+# systems are loaded once per request and never outlive it, so a change of
+# owner or a deleted system applies to the next request in every worker.
+def owned_by_request(request, system_ids):
+    owned = request.__dict__.get("_owned_system_ids")
+    if owned is None:
+        owned = set(
+            HydroponicSystem.objects.filter(owner_id=request.user.pk).values_list(
+                "pk", flat=True
+            )
+        )
+        request.__dict__["_owned_system_ids"] = owned
+    return {
+        system_id: HydroponicSystem(pk=system_id, owner_id=request.user.pk)
+        for system_id in system_ids
+        if system_id in owned
+    }
@@ -0,0 +1,117 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple("Cursor", ["field", "value", "pk", "reverse"])
+
+
+# Cursor pagination keyed on (ordering field, primary key). Unlike DRF's
+# CursorPagination the position never falls back to an offset, so ties in the
+# ordering field don't make deep pages slower and no page runs a COUNT(*).
+class KeysetCursorPagination(CursorPagination):
+    ordering = "-timestamp"
+    tiebreaker = "id"
+    page_size_query_param = "page_size"
+    max_page_size = settings.READINGS_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.paginate_rows(list(queryset))
+
+    def prepare_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        order = self.get_ordering(request, queryset, view)[0]
+        self.field = order.lstrip("-")
+        self.descending = order.startswith("-")
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        direction = "-" if self.descending != reverse else ""
+        queryset = queryset.order_by(
+            direction + self.field, direction + self.tiebreaker
+        )
+        if self.cursor is not None:
+            lookup = "lt" if direction else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{lookup}": self.cursor.value})
+                | Q(
+                    **{
+                        self.field: self.cursor.value,
+                        f"{self.tiebreaker}__{lookup}": self.cursor.pk,
+                    }
+                )
+            )
+        # One extra row tells whether another page follows
+        return queryset[: self.page_size + 1]
+
+    def paginate_rows(self, rows):
+        self.page = rows[: self.page_size]
+        has_more = len(rows) > self.page_size
+
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        if not self.page:
+            self.has_next = self.has_previous = False
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self._cursor_for(self.page[-1], reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self._cursor_for(self.page[0], reverse=True))
+
+    def _cursor_for(self, row, reverse):
+        if isinstance(row, dict):
+            value, pk = row[self.field], row[self.tiebreaker]
+        else:
+            value, pk = getattr(row, self.field), getattr(row, self.tiebreaker)
+        return Cursor(self.field, value, pk, reverse)
+
+    def encode_cursor(self, cursor):
+        value = cursor.value
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        token = json.dumps([cursor.field, value, cursor.pk, int(cursor.reverse)])
+        encoded = urlsafe_b64encode(token.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            field, value, pk, reverse = json.loads(urlsafe_b64decode(encoded))
+            # A cursor is only meaningful for the ordering it was issued for
+            if field != self.field:
+                raise ValueError(field)
+            value = self.model._meta.get_field(field).to_python(value)
+            pk = int(pk)
+        except (TypeError, ValueError, DjangoValidationError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+        return Cursor(field, value, pk, bool(reverse))
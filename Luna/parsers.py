@@ -0,0 +1,91 @@
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import json
+
+
+class NDJSONParser(BaseParser):
+    # One JSON document per line, as pushed by the sensor gateways
+    media_type = "application/x-ndjson"
+    strict = api_settings.STRICT_JSON
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        # NaN and Infinity are refused like JSONParser does, they can't be
+        # rendered back
+        parse_constant = json.strict_constant if self.strict else None
+        rows = []
+        for line_number, line in enumerate(iter(stream.readline, b""), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(
+                    json.loads(line.decode(encoding), parse_constant=parse_constant)
+                )
+            except ValueError as exc:
+                raise ParseError(
+                    f"NDJSON parse error on line {line_number} - {exc}"
+                ) from exc
+        return rows
+
+
+# Compact binary readings: fixed-width little-endian records of
+# (hydroponic_system, timestamp, temperature, ph, tds), the timestamp in
+# microseconds since the Unix epoch (UTC). Readings are unique per system and
+# timestamp, so records carry no id. 40 bytes a reading, against some 130 as
+# JSON, and no text to parse on either side.
+READING_RECORD = struct.Struct("<qqddd")
+READING_RECORDS_MEDIA_TYPE = "application/vnd.luna.readings"
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def is_reading_records(request):
+    return request.content_type.split(";")[0].strip() == READING_RECORDS_MEDIA_TYPE
+
+
+class ReadingRecordsParser(BaseParser):
+    # Always a list of readings, create takes a body of exactly one
+    media_type = READING_RECORDS_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = stream.read() if stream is not None else b""
+        if len(body) % READING_RECORD.size:
+            raise ParseError(
+                f"Reading records parse error - {len(body)} bytes is not a multiple "
+                f"of {READING_RECORD.size}"
+            )
+        rows = []
+        for index, (system_id, microseconds, temperature, ph, tds) in enumerate(
+            READING_RECORD.iter_unpack(body)
+        ):
+            try:
+                timestamp = UNIX_EPOCH + timedelta(microseconds=microseconds)
+            except OverflowError as exc:
+                raise ParseError(
+                    f"Reading records parse error in record {index} - "
+                    "timestamp out of range"
+                ) from exc
+            # Same as JSON bodies, see NDJSONParser
+            if not all(math.isfinite(value) for value in (temperature, ph, tds)):
+                raise ParseError(
+                    f"Reading records parse error in record {index} - "
+                    "values must be finite numbers"
+                )
+            rows.append(
+                {
+                    "hydroponic_system": system_id,
+                    "temperature": temperature,
+                    "ph": ph,
+                    "tds": tds,
+                    "timestamp": timestamp,
+                }
+            )
+        return rows
@@ -0,0 +1,169 @@
+import re
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import Reading
+
+TABLE = Reading._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def _bound(month):
+    # Partition bounds are month boundaries in UTC
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [connection.ops.quote_name(TABLE)],
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def list_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            ORDER BY child.relname
+            """,
+            [connection.ops.quote_name(TABLE)],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def monthly_partitions():
+    partitions = {}
+    for name in list_partitions():
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+# Rebuilds the readings table as a table partitioned by month on timestamp.
+# PostgreSQL requires the partition key in every unique constraint, so the
+# primary key becomes (id, timestamp). Rows outside any monthly partition land
+# in the default partition until create_partitions claims them.
+def convert_to_partitioned():
+    quote = connection.ops.quote_name
+    legacy = f"{TABLE}_legacy"
+
+    with transaction.atomic(), connection.schema_editor() as editor:
+        editor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}")
+        editor.execute(
+            f"CREATE TABLE {quote(TABLE)} "
+            f"(LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        editor.execute(
+            f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} "
+            "DEFAULT"
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') "
+                f"FROM {quote(legacy)}"
+            )
+            months = [row[0].date() for row in cursor.fetchall()]
+        for month in months:
+            _create_partition(editor, month)
+
+        editor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(legacy)}")
+        editor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT max(id) FROM {quote(legacy)}), 0) + 1, false)",
+            [quote(TABLE)],
+        )
+        editor.execute(f"DROP TABLE {quote(legacy)}")
+
+        # Constraints and indexes are declared on the parent and cascade to
+        # every partition, including the ones created later on
+        editor.execute(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + '_pkey')} "
+            'PRIMARY KEY ("id", "timestamp")'
+        )
+        field = Reading._meta.get_field("hydroponic_system")
+        editor.execute(
+            editor._create_fk_sql(Reading, field, "_fk_%(to_table)s_%(to_column)s")
+        )
+        for sql in editor._model_indexes_sql(Reading):
+            editor.execute(sql)
+        for constraint in Reading._meta.constraints:
+            editor.add_constraint(Reading, constraint)
+
+    return months
+
+
+def _create_partition(editor, month):
+    quote = connection.ops.quote_name
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+
+    # Rows for this month may already sit in the default partition, so they are
+    # moved into the new table before it is attached
+    editor.execute(
+        f"CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)"
+    )
+    editor.execute(
+        f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+        f'WHERE "timestamp" >= {lower} AND "timestamp" < {upper} RETURNING *) '
+        f"INSERT INTO {quote(name)} SELECT * FROM moved"
+    )
+    editor.execute(
+        f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} "
+        f"FOR VALUES FROM ({lower}) TO ({upper})"
+    )
+
+
+def create_partitions(first_month, last_month):
+    existing = monthly_partitions()
+    created = []
+    month = month_start(first_month)
+    with transaction.atomic(), connection.schema_editor() as editor:
+        while month <= last_month:
+            if month not in existing:
+                _create_partition(editor, month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def detach_partition(editor, name, drop=False):
+    quote = connection.ops.quote_name
+    editor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+    if drop:
+        editor.execute(f"DROP TABLE {quote(name)}")
+
+
+def detach_partitions(before_month, drop=False):
+    detached = []
+    with transaction.atomic(), connection.schema_editor() as editor:
+        for month, name in sorted(monthly_partitions().items()):
+            if month >= before_month:
+                break
+            detach_partition(editor, name, drop=drop)
+            detached.append(name)
+    return detached
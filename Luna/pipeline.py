@@ -0,0 +1,148 @@
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import latest_readings
+from .ingest import write_readings
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Ingestion queue is full, retry later."
+    default_code = "queue_full"
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+# A batch larger than the whole queue would never fit, however long it waits
+class BatchTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = "batch_too_large"
+
+
+class ReadingWriter:
+    # Bounded in-process queue of validated, unsaved readings. A background
+    # thread writes them in batches of READINGS_BULK_BATCH_SIZE, or whatever is
+    # queued once ``flush_interval`` seconds pass. Producers wait up to
+    # ``timeout`` seconds for room and get QueueFull after that.
+    def __init__(self, maxsize, batch_size, flush_interval, timeout, autostart=True):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.autostart = autostart
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, readings):
+        if len(readings) > self.maxsize:
+            raise BatchTooLarge(
+                f"Ensure there are at most {self.maxsize} readings, the size of "
+                "the ingestion queue."
+            )
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: len(self.pending) + len(readings) <= self.maxsize,
+                self.timeout,
+            ):
+                raise QueueFull()
+            self.pending.extend(readings)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+        if self.autostart:
+            self.start()
+
+    def flush(self):
+        # Writes everything queued so far. Also called directly by tests and on
+        # shutdown; the lock keeps batches from being written concurrently.
+        with self.flush_lock:
+            while True:
+                with self.condition:
+                    count = min(len(self.pending), self.batch_size)
+                    batch = [self.pending.popleft() for _ in range(count)]
+                    self.condition.notify_all()
+                if not batch:
+                    return
+                try:
+                    self.write(batch)
+                except Exception:
+                    # Retrying a batch that fails for another reason would
+                    # block every batch behind it, so it is logged and dropped
+                    logger.exception("Dropped %d queued readings", len(batch))
+
+    # Readings of many users share a batch and were accepted with 202, so a
+    # batch the database rejects, e.g. for a system deleted since validation,
+    # is split in halves until only the failing readings are dropped
+    def write(self, batch):
+        try:
+            with transaction.atomic():
+                # Foreign keys are deferred, fail on the insert instead
+                with connection.cursor() as cursor:
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                write_readings(batch)
+        except DatabaseError:
+            # The rolled back readings may have reached the cached ones
+            latest_readings.forget({reading.hydroponic_system_id for reading in batch})
+            if len(batch) == 1:
+                logger.exception("Dropped a queued reading")
+                return
+            middle = len(batch) // 2
+            self.write(batch[:middle])
+            self.write(batch[middle:])
+
+    def start(self):
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.stopping.clear()
+            self.thread = threading.Thread(
+                target=self.run, name="reading-writer", daemon=True
+            )
+            self.thread.start()
+
+    def run(self):
+        while not self.stopping.is_set():
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: len(self.pending) >= self.batch_size
+                    or self.stopping.is_set(),
+                    self.flush_interval,
+                )
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def stop(self, timeout=None):
+        with self.condition:
+            thread, self.thread = self.thread, None
+            self.stopping.set()
+            self.condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        # Whatever the thread left behind, e.g. if it was never started
+        self.flush()
+
+
+writer = ReadingWriter(
+    maxsize=settings.READINGS_INGEST_QUEUE_SIZE,
+    batch_size=settings.READINGS_BULK_BATCH_SIZE,
+    flush_interval=settings.READINGS_INGEST_FLUSH_INTERVAL,
+    timeout=settings.READINGS_INGEST_ENQUEUE_TIMEOUT,
+)
+# Worker processes exit normally on graceful shutdown, so whatever is still
+# queued is written before the process goes away
+atexit.register(writer.stop)
@@ -0,0 +1,189 @@
+import csv
+import json
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .parsers import READING_RECORD, READING_RECORDS_MEDIA_TYPE, UNIX_EPOCH
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet exports are optional
+    pyarrow = None
+
+
+# Rows are written and flushed to the client in chunks of the same size the
+# database cursor fetches them in
+def _chunks(rows):
+    rows = iter(rows)
+    while chunk := list(islice(rows, settings.READINGS_EXPORT_CHUNK_SIZE)):
+        yield chunk
+
+
+class _Buffer:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+    def drain(self):
+        data = "".join(self.parts)
+        self.parts = []
+        return data
+
+
+class _BinaryBuffer(_Buffer):
+    closed = False
+
+    def __init__(self):
+        super().__init__()
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class ExportRenderer(BaseRenderer):
+    # Exports stream their body through ``stream``, ``render`` is only used for
+    # error responses raised before streaming starts. Rows passed to ``stream``
+    # end with their timestamp.
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+    def stream(self, columns, rows):
+        raise NotImplementedError
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def stream(self, columns, rows):
+        buffer = _Buffer()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.drain()
+        for chunk in _chunks(rows):
+            writer.writerows((*row[:-1], row[-1].isoformat()) for row in chunk)
+            yield buffer.drain()
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def stream(self, columns, rows):
+        encode = json.JSONEncoder(separators=(",", ":")).encode
+        for chunk in _chunks(rows):
+            yield "".join(
+                encode(dict(zip(columns, (*row[:-1], row[-1].isoformat())))) + "\n"
+                for row in chunk
+            )
+
+
+class ParquetRenderer(ExportRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+    charset = None
+
+    def stream(self, columns, rows):
+        schema = pyarrow.schema(
+            [
+                ("id", pyarrow.int64()),
+                ("hydroponic_system", pyarrow.int64()),
+                ("temperature", pyarrow.float64()),
+                ("ph", pyarrow.float64()),
+                ("tds", pyarrow.float64()),
+                ("timestamp", pyarrow.timestamp("us", tz="UTC")),
+            ]
+        )
+        sink = _BinaryBuffer()
+        with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+            for chunk in _chunks(rows):
+                # Every chunk becomes one row group, flushed right away
+                writer.write_table(
+                    pyarrow.Table.from_arrays(
+                        [pyarrow.array(column) for column in zip(*chunk)],
+                        schema=schema,
+                    )
+                )
+                yield sink.drain()
+        yield sink.drain()
+
+
+def _record(system_id, temperature, ph, tds, timestamp):
+    if isinstance(timestamp, str):
+        timestamp = parse_datetime(timestamp)
+    return READING_RECORD.pack(
+        system_id,
+        (timestamp - UNIX_EPOCH) // timedelta(microseconds=1),
+        temperature,
+        ph,
+        tds,
+    )
+
+
+class ReadingRecordsRenderer(ExportRenderer):
+    # See Luna.parsers.READING_RECORD. Readings come as serialized dicts or
+    # ``.values()`` rows, a single one, a list or a page whose links go to the
+    # Link header. Anything else, like errors, is rendered as JSON.
+    media_type = READING_RECORDS_MEDIA_TYPE
+    format = "bin"
+    charset = None
+    fields = ("hydroponic_system", "temperature", "ph", "tds", "timestamp")
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if isinstance(data, dict) and "results" in data:
+            if response is not None:
+                links = [
+                    f'<{data[rel]}>; rel="{rel}"'
+                    for rel in ("next", "previous")
+                    if data.get(rel)
+                ]
+                if links:
+                    response["Link"] = ", ".join(links)
+            data = data["results"]
+        if isinstance(data, dict) and "timestamp" in data:
+            data = [data]
+        if (response is not None and response.status_code >= 400) or not (
+            isinstance(data, list)
+            and all(isinstance(row, dict) and "timestamp" in row for row in data)
+        ):
+            if response is not None:
+                response["Content-Type"] = "application/json"
+            return super().render(data, accepted_media_type, renderer_context)
+        return b"".join(_record(*(row[field] for field in self.fields)) for row in data)
+
+    def stream(self, columns, rows):
+        positions = [columns.index(field) for field in self.fields]
+        for chunk in _chunks(rows):
+            yield b"".join(_record(*(row[i] for i in positions)) for row in chunk)
+
+
+EXPORT_RENDERERS = [CSVRenderer, NDJSONRenderer, ReadingRecordsRenderer]
+if pyarrow is not None:
+    EXPORT_RENDERERS.append(ParquetRenderer)
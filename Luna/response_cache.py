@@ -0,0 +1,139 @@
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from . import ownership
+from .models import Reading
+
+# Every owner has a random version token, replaced on each write that can
+# change their systems' responses. Cached responses and ETags embed it, so old
+# entries are never read again and simply expire. A random token, unlike a
+# counter, cannot repeat after the cache is flushed.
+
+
+def version_key(owner_id):
+    return f"luna:systems-version:{owner_id}"
+
+
+def version(owner_id):
+    key = version_key(owner_id)
+    current = cache.get(key)
+    if current is None:
+        current = uuid4().hex
+        if not cache.add(key, current, None):
+            current = cache.get(key, current)
+    return current
+
+
+async def aversion(owner_id):
+    key = version_key(owner_id)
+    current = await cache.aget(key)
+    if current is None:
+        current = uuid4().hex
+        if not await cache.aadd(key, current, None):
+            current = await cache.aget(key, current)
+    return current
+
+
+def bump(owner_ids):
+    cache.set_many({version_key(owner_id): uuid4().hex for owner_id in owner_ids}, None)
+
+
+# Maps the systems of the readings to their owners, without a query when the
+# readings carry their system, as they do on the API write paths
+def system_owners(readings):
+    owners, missing = {}, set()
+    for reading in readings:
+        if Reading.hydroponic_system.is_cached(reading):
+            owners[reading.hydroponic_system_id] = reading.hydroponic_system.owner_id
+        else:
+            missing.add(reading.hydroponic_system_id)
+    missing -= owners.keys()
+    if missing:
+        owners.update(ownership.owners(missing))
+    return owners
+
+
+def owners_of(readings):
+    return set(system_owners(readings).values())
+
+
+def _response_key(request, owner_id, owner_version, format, action):
+    # Renderer format and host are part of the response as much as the query
+    path = f"{format}:{request.get_host()}:{request.get_full_path()}"
+    digest = hashlib.md5(path.encode(), usedforsecurity=False).hexdigest()
+    return f"luna:systems-response:{owner_id}:{owner_version}:{action}:{digest}"
+
+
+def response_key(request, action):
+    owner_id = request.user.pk
+    return _response_key(
+        request, owner_id, version(owner_id), request.accepted_renderer.format, action
+    )
+
+
+def _etag(key):
+    return '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def _cache_headers(response, etag):
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+class CachedResponseMixin:
+    # Caches successful responses of ``cached_actions`` per user, and answers
+    # a matching If-None-Match with 304 after a single cache lookup
+    cached_actions = ("list", "retrieve")
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cached_actions:
+            return handler(request, *args, **kwargs)
+
+        key = response_key(request, self.action)
+        etag = _etag(key)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.SYSTEMS_RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+        return _cache_headers(response, etag)
+
+
+# CachedResponseMixin for the async views: ``handler()`` returns the data of
+# the JSON response, or raises for an error response, which is not cached
+async def acached_response(request, user, action, handler):
+    key = _response_key(request, user.pk, await aversion(user.pk), "json", action)
+    etag = _etag(key)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        return _cache_headers(HttpResponseNotModified(), etag)
+    data = await cache.aget(key)
+    if data is None:
+        data = await handler()
+        await cache.aset(key, data, settings.SYSTEMS_RESPONSE_CACHE_TIMEOUT)
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type="application/json"
+    )
+    return _cache_headers(response, etag)
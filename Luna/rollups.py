@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from . import latest_readings, partitioning, response_cache
+from .aggregation import BUCKET_ORIGIN, METRICS
+from .models import DailyRollup, HourlyRollup, HydroponicSystem, Reading
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+ROLLUPS = ((HourlyRollup, HOUR), (DailyRollup, DAY))
+
+_quote = connection.ops.quote_name
+READING_TABLE = _quote(Reading._meta.db_table)
+COLUMNS = ", ".join(
+    ["hydroponic_system_id", "bucket", "count"]
+    + [f"{metric}_{name}" for metric in METRICS for name in ("min", "max", "avg")]
+)
+AGGREGATES = ", ".join(
+    f"min({metric}), max({metric}), avg({metric})" for metric in METRICS
+)
+# Rows rolled up by an earlier run are merged with the new ones, averages are
+# weighted by their counts
+MERGE = ", ".join(
+    ["count = rollup.count + EXCLUDED.count"]
+    + [
+        f"{metric}_min = LEAST(rollup.{metric}_min, EXCLUDED.{metric}_min), "
+        f"{metric}_max = GREATEST(rollup.{metric}_max, EXCLUDED.{metric}_max), "
+        f"{metric}_avg = (rollup.{metric}_avg * rollup.count "
+        f"+ EXCLUDED.{metric}_avg * EXCLUDED.count) "
+        f"/ (rollup.count + EXCLUDED.count)"
+        for metric in METRICS
+    ]
+)
+
+
+def _rollup_sql(model, stride, source):
+    return f"""
+        INSERT INTO {_quote(model._meta.db_table)} AS rollup ({COLUMNS})
+        SELECT
+            hydroponic_system_id,
+            date_bin('{stride.total_seconds():.0f} seconds', "timestamp", %(origin)s),
+            count(*),
+            {AGGREGATES}
+        FROM {source}
+        GROUP BY 1, 2
+        ON CONFLICT (hydroponic_system_id, bucket) DO UPDATE SET {MERGE}
+    """
+
+
+# Deletes a batch of old readings and adds them to both rollups in a single
+# statement, so a reading is either raw or rolled up, never both or neither
+BATCH_SQL = f"""
+    WITH batch AS (
+        DELETE FROM {READING_TABLE}
+        WHERE id IN (
+            SELECT id FROM {READING_TABLE}
+            WHERE "timestamp" < %(cutoff)s
+            LIMIT %(limit)s
+        )
+        RETURNING hydroponic_system_id, temperature, ph, tds, "timestamp"
+    ),
+    hourly AS ({_rollup_sql(HourlyRollup, HOUR, "batch")}),
+    daily AS ({_rollup_sql(DailyRollup, DAY, "batch")})
+    SELECT count(*), coalesce(array_agg(DISTINCT hydroponic_system_id), '{{}}')
+    FROM batch
+"""
+
+
+def _roll_up_partition(editor, name, drop):
+    source = _quote(name)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT hydroponic_system_id FROM {source}")
+        system_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT count(*) FROM {source}")
+        rows = cursor.fetchone()[0]
+        for model, stride in ROLLUPS:
+            cursor.execute(
+                _rollup_sql(model, stride, source), {"origin": BUCKET_ORIGIN}
+            )
+    partitioning.detach_partition(editor, name, drop=drop)
+    return rows, system_ids
+
+
+# Removed readings may have been the latest ones of their system
+def _forget(system_ids):
+    if not system_ids:
+        return
+    latest_readings.forget(system_ids)
+    response_cache.bump(
+        HydroponicSystem.objects.filter(pk__in=system_ids)
+        .values_list("owner_id", flat=True)
+        .distinct()
+    )
+
+
+# Rolls up and removes every reading older than ``cutoff``. Monthly partitions
+# that end before the cutoff are rolled up whole and detached (or dropped),
+# the remaining readings are deleted in batches of ``batch_size`` rows.
+# Yields the number of readings rolled up by every step.
+def roll_up(cutoff, batch_size, drop=False):
+    if partitioning.is_partitioned():
+        for month, name in sorted(partitioning.monthly_partitions().items()):
+            end = partitioning.add_months(month, 1)
+            if end > cutoff.date():
+                break
+            with transaction.atomic(), connection.schema_editor() as editor:
+                rows, system_ids = _roll_up_partition(editor, name, drop)
+            _forget(system_ids)
+            yield rows
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                BATCH_SQL,
+                {"cutoff": cutoff, "limit": batch_size, "origin": BUCKET_ORIGIN},
+            )
+            rows, system_ids = cursor.fetchone()
+        _forget(system_ids)
+        yield rows
+        if rows < batch_size:
+            return
+
+
+# The rollup serving ``bucket``, if readings past retention can be aggregated
+# into it at all
+def rollup_for(bucket):
+    for model, stride in reversed(ROLLUPS):
+        if bucket % stride == timedelta(0):
+            return model
+    return None
@@ -1,15 +1,81 @@
+import math
+import operator
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
 
-from Luna.models import HydroponicSystem, Reading
+from main.metrics import TimedSerializerMixin, timed_serialization
+
+from Luna import latest_readings, ownership
+from Luna.aggregation import AGGREGATES, parse_bucket
+from Luna.models import Alert, AlertRule, HydroponicSystem, Reading, SystemState
+
+
+class FiniteFloatField(serializers.FloatField):
+    # float() takes "NaN" and "inf", which the JSON renderer can't output
+    default_error_messages = {"not_finite": "Ensure this value is a finite number."}
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if not math.isfinite(value):
+            self.fail("not_finite")
+        return value
+
+
+FINITE_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.FloatField: FiniteFloatField,
+}
+
 
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
 
-class HydroponicSystemSerializer(serializers.HyperlinkedModelSerializer):
+
+class LatestReadingsListSerializer(TimedListSerializer):
+    # Looks up the latest readings of the whole page at once instead of once
+    # per system, unless the context brings them already
+    def to_representation(self, data):
+        systems = list(data.all() if isinstance(data, models.Manager) else data)
+        if "latest_readings" not in self.child.context:
+            self.child.context["latest_readings"] = latest_readings.get_many(
+                system.pk for system in systems
+            )
+        return super().to_representation(systems)
+
+
+class HydroponicSystemSerializer(
+    TimedSerializerMixin, serializers.HyperlinkedModelSerializer
+):
     owner = serializers.ReadOnlyField(source="owner.username")
+    latest_reading = serializers.SerializerMethodField()
 
     class Meta:
         model = HydroponicSystem
-        fields = ["id", "owner", "name", "description", "created_at", "updated_at"]
+        fields = [
+            "id",
+            "owner",
+            "name",
+            "description",
+            "created_at",
+            "updated_at",
+            "latest_reading",
+        ]
         read_only_fields = ["created_at", "updated_at", "owner"]
+        list_serializer_class = LatestReadingsListSerializer
+
+    def _latest_readings(self, obj):
+        prefetched = self.context.get("latest_readings", {})
+        if obj.pk in prefetched:
+            return prefetched[obj.pk]
+        return latest_readings.get_many([obj.pk])[obj.pk]
+
+    def get_latest_reading(self, obj):
+        readings = self._latest_readings(obj)
+        return ReadingSerializer(readings[0]).data if readings else None
 
 
 class HydroponicSystemDetailSerializer(HydroponicSystemSerializer):
@@ -19,23 +85,240 @@ class HydroponicSystemDetailSerializer(HydroponicSystemSerializer):
         fields = HydroponicSystemSerializer.Meta.fields + ["latest_readings"]
 
     def get_latest_readings(self, obj):
-        readings = obj.readings.all().order_by("-timestamp")[:10]
-        return ReadingSerializer(readings, many=True).data
+        return ReadingSerializer(self._latest_readings(obj), many=True).data
+
+
+class OwnedSystemField(serializers.PrimaryKeyRelatedField):
+    # Accepts the primary keys of the request user's systems, checked against
+    # the cached owners in Luna.ownership, and returns unsaved stand-ins. The
+    # queryset only lists the choices, e.g. in the browsable API.
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", HydroponicSystem.objects.all())
+        super().__init__(**kwargs)
 
+    def get_queryset(self):
+        request = self.context.get("request")
+        if request is None:
+            return HydroponicSystem.objects.none()
+        return super().get_queryset().filter(owner=request.user)
 
-class ReadingSerializer(serializers.ModelSerializer):
-    hydroponic_system = serializers.PrimaryKeyRelatedField(
-        queryset=HydroponicSystem.objects.none()
-    )
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except ValueError:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        request = self.context.get("request")
+        system = None
+        if request is not None:
+            system = ownership.owned_by_request(request, [pk]).get(pk)
+        if system is None:
+            self.fail("does_not_exist", pk_value=data)
+        return system
+
+
+class ReadingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    serializer_field_mapping = FINITE_FIELD_MAPPING
+    hydroponic_system = OwnedSystemField()
 
     class Meta:
         model = Reading
         fields = ["id", "hydroponic_system", "temperature", "ph", "tds", "timestamp"]
-        read_only_fields = ["timestamp"]
+        list_serializer_class = TimedListSerializer
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if "request" in self.context:
-            self.fields["hydroponic_system"].queryset = HydroponicSystem.objects.filter(
-                owner=self.context["request"].user
+        # Duplicates are skipped by the insert itself, see Luna.ingest
+        validators = []
+
+    # An update moving a reading onto another reading of a system fails here
+    # instead of on the unique constraint. Only checked when it moves.
+    def validate(self, attrs):
+        if self.instance is None:
+            return attrs
+        system = attrs.get("hydroponic_system")
+        system_id = self.instance.hydroponic_system_id if system is None else system.pk
+        timestamp = attrs.get("timestamp", self.instance.timestamp)
+        moved = (system_id, timestamp) != (
+            self.instance.hydroponic_system_id,
+            self.instance.timestamp,
+        )
+        if (
+            moved
+            and Reading.objects.filter(
+                hydroponic_system_id=system_id, timestamp=timestamp
+            )
+            .exclude(pk=self.instance.pk)
+            .exists()
+        ):
+            raise serializers.ValidationError(
+                {"timestamp": "The system already has a reading at this time."}
             )
+        return attrs
+
+
+def format_datetime(value, tz):
+    # Same output as DRF's DateTimeField with the default ISO 8601 format
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class ReadingValuesSerializer:
+    # Read-only fast path producing the same output as ReadingSerializer from
+    # ``.values(*ReadingValuesSerializer.fields)`` rows, without per-field DRF
+    # machinery or model instances
+    fields = ("id", "hydroponic_system", "temperature", "ph", "tds", "timestamp")
+    _values = operator.itemgetter(*fields[:-1])
+
+    def __init__(self, instance, many=False):
+        self.instance = instance
+        self.many = many
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return self.to_representation()
+
+    def to_representation(self):
+        tz = timezone.get_current_timezone()
+        values, fields = self._values, self.fields
+        if not self.many:
+            row = self.instance
+            return dict(
+                zip(fields, (*values(row), format_datetime(row["timestamp"], tz)))
+            )
+        return [
+            dict(zip(fields, (*values(row), format_datetime(row["timestamp"], tz))))
+            for row in self.instance
+        ]
+
+
+class SystemStateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    name = serializers.ReadOnlyField(source="hydroponic_system.name")
+
+    class Meta:
+        model = SystemState
+        fields = ["hydroponic_system", "name", "temperature", "ph", "tds", "last_seen"]
+        list_serializer_class = TimedListSerializer
+
+
+class BulkReadingSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = FINITE_FIELD_MAPPING
+    # Ownership is checked once per distinct system for the whole batch,
+    # so rows only carry the raw primary key here
+    hydroponic_system = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Reading
+        fields = ["hydroponic_system", "temperature", "ph", "tds", "timestamp"]
+        validators = []
+
+
+class ReadingAggregateQuerySerializer(serializers.Serializer):
+    bucket = serializers.CharField(default="1h")
+    agg = serializers.CharField(default="avg,min,max")
+
+    def validate_bucket(self, value):
+        bucket = parse_bucket(value)
+        if bucket is None:
+            raise serializers.ValidationError(
+                'Expected a bucket size such as "30s", "5m", "1h" or "1d".'
+            )
+        return bucket
+
+    def validate_agg(self, value):
+        names = list(dict.fromkeys(name.strip() for name in value.split(",")))
+        unknown = [name for name in names if name not in AGGREGATES]
+        if unknown or not names:
+            raise serializers.ValidationError(
+                f"Expected a comma separated subset of {', '.join(AGGREGATES)}."
+            )
+        return names
+
+
+class ReadingAnalyticsQuerySerializer(serializers.Serializer):
+    timestamp_after = serializers.DateTimeField(required=False, default=None)
+    timestamp_before = serializers.DateTimeField(required=False, default=None)
+    window = serializers.CharField(default="1h")
+    points = serializers.IntegerField(default=500, min_value=1)
+
+    def validate_window(self, value):
+        window = parse_bucket(value)
+        if window is None:
+            raise serializers.ValidationError(
+                'Expected a window size such as "30s", "5m", "1h" or "1d".'
+            )
+        return window
+
+    def validate_points(self, value):
+        if value > settings.READINGS_ANALYTICS_MAX_POINTS:
+            raise serializers.ValidationError(
+                f"Ensure this value is at most {settings.READINGS_ANALYTICS_MAX_POINTS}."
+            )
+        return value
+
+
+class AlertRuleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    hydroponic_system = OwnedSystemField()
+
+    class Meta:
+        model = AlertRule
+        fields = [
+            "id",
+            "hydroponic_system",
+            "metric",
+            "min_value",
+            "max_value",
+            "max_rate",
+            "sustained_for",
+            "is_active",
+            "created_at",
+        ]
+        read_only_fields = ["created_at"]
+        list_serializer_class = TimedListSerializer
+
+    def validate(self, attrs):
+        values = {
+            name: attrs.get(name, getattr(self.instance, name, None))
+            for name in ("min_value", "max_value", "max_rate", "sustained_for")
+        }
+        if all(values[name] is None for name in ("min_value", "max_value", "max_rate")):
+            raise serializers.ValidationError(
+                "Expected at least one of min_value, max_value or max_rate."
+            )
+        if (
+            values["min_value"] is not None
+            and values["max_value"] is not None
+            and values["min_value"] > values["max_value"]
+        ):
+            raise serializers.ValidationError(
+                {"max_value": "Must not be lower than min_value."}
+            )
+        if values["max_rate"] is not None and values["max_rate"] <= 0:
+            raise serializers.ValidationError({"max_rate": "Must be positive."})
+        sustained_for = values["sustained_for"]
+        if sustained_for is not None and sustained_for < timedelta(0):
+            raise serializers.ValidationError(
+                {"sustained_for": "Must not be negative."}
+            )
+        return attrs
+
+
+class AlertSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    metric = serializers.ReadOnlyField(source="rule.metric")
+
+    class Meta:
+        model = Alert
+        fields = [
+            "id",
+            "rule",
+            "hydroponic_system",
+            "metric",
+            "reason",
+            "value",
+            "started_at",
+            "triggered_at",
+            "resolved_at",
+        ]
+        list_serializer_class = TimedListSerializer
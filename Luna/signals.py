@@ -0,0 +1,84 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import alerts, latest_readings, live, ownership, response_cache, system_state
+from .models import AlertRule, HydroponicSystem, Reading
+
+# Sent with ``readings`` for every write path, including bulk_create which
+# doesn't send post_save
+readings_written = Signal()
+
+
+@receiver(post_save, sender=Reading)
+def reading_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        readings_written.send(sender=Reading, readings=[instance])
+        return
+    # An edit is no new reading: it may have moved to another system or back
+    # in time, so what was derived from both systems is recomputed like after
+    # a delete, and alerts and live streams are left alone
+    system_ids = {instance.hydroponic_system_id}
+    owner_ids = response_cache.owners_of([instance])
+    previous = getattr(instance, "_loaded_system_id", None)
+    if previous is not None and previous not in system_ids:
+        system_ids.add(previous)
+        owner_ids |= set(ownership.owners([previous]).values())
+    readings_changed(system_ids, owner_ids)
+    instance._loaded_system_id = instance.hydroponic_system_id
+
+
+# For writes that may replace or remove stored readings rather than add newer
+# ones
+def readings_changed(system_ids, owner_ids):
+    system_ids = list(system_ids)
+    latest_readings.forget(system_ids)
+    system_state.refresh(system_ids)
+    response_cache.bump(owner_ids)
+
+
+@receiver(readings_written)
+def update_latest_readings(sender, readings, **kwargs):
+    latest_readings.push(readings)
+
+
+@receiver(readings_written)
+def update_system_state(sender, readings, **kwargs):
+    system_state.upsert(readings)
+
+
+# Deliberately not connected to Reading's post_delete: any receiver there stops
+# Django from fast-deleting the readings of a deleted system
+@receiver(post_delete, sender=HydroponicSystem)
+def forget_latest_readings(sender, instance, **kwargs):
+    latest_readings.forget([instance.pk])
+
+
+@receiver(readings_written)
+def invalidate_reading_responses(sender, readings, **kwargs):
+    response_cache.bump(response_cache.owners_of(readings))
+
+
+@receiver(readings_written)
+def publish_readings(sender, readings, **kwargs):
+    live.publish(readings)
+
+
+@receiver(post_save, sender=HydroponicSystem)
+@receiver(post_delete, sender=HydroponicSystem)
+def invalidate_system_responses(sender, instance, **kwargs):
+    previous = getattr(instance, "_loaded_owner_id", None)
+    response_cache.bump({instance.owner_id, previous or instance.owner_id})
+    instance._loaded_owner_id = instance.owner_id
+
+
+@receiver(readings_written)
+def evaluate_alerts(sender, readings, **kwargs):
+    alerts.evaluate(readings)
+
+
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+def forget_alert_rule(sender, instance, **kwargs):
+    alerts.forget(instance)
@@ -0,0 +1,78 @@
+from django.db import connection
+
+from .models import Reading, SystemState
+
+STATE_TABLE = connection.ops.quote_name(SystemState._meta.db_table)
+READING_TABLE = connection.ops.quote_name(Reading._meta.db_table)
+COLUMNS = "hydroponic_system_id, temperature, ph, tds, last_seen"
+
+# A batch may arrive out of order with respect to what is already stored, so
+# the stored state is only replaced by a reading that is at least as recent
+UPSERT_SQL = f"""
+    INSERT INTO {STATE_TABLE} ({COLUMNS})
+    VALUES {{values}}
+    ON CONFLICT (hydroponic_system_id) DO UPDATE SET
+        temperature = EXCLUDED.temperature,
+        ph = EXCLUDED.ph,
+        tds = EXCLUDED.tds,
+        last_seen = EXCLUDED.last_seen
+    WHERE {STATE_TABLE}.last_seen <= EXCLUDED.last_seen
+"""
+
+# The latest reading of each system from one index scan of
+# reading_system_ts_unique, DISTINCT ON would sort all of their readings
+REFRESH_SQL = f"""
+    INSERT INTO {STATE_TABLE} ({COLUMNS})
+    SELECT system.id, latest.temperature, latest.ph, latest.tds, latest."timestamp"
+    FROM unnest(%s::bigint[]) AS system(id)
+    CROSS JOIN LATERAL (
+        SELECT temperature, ph, tds, "timestamp"
+        FROM {READING_TABLE}
+        WHERE hydroponic_system_id = system.id
+        ORDER BY "timestamp" DESC
+        LIMIT 1
+    ) AS latest
+    ON CONFLICT (hydroponic_system_id) DO UPDATE SET
+        temperature = EXCLUDED.temperature,
+        ph = EXCLUDED.ph,
+        tds = EXCLUDED.tds,
+        last_seen = EXCLUDED.last_seen
+"""
+
+
+# One statement per batch, no matter how many systems it touches
+def upsert(readings):
+    latest = {}
+    for reading in readings:
+        current = latest.get(reading.hydroponic_system_id)
+        if current is None or (current.timestamp, current.pk) < (
+            reading.timestamp,
+            reading.pk,
+        ):
+            latest[reading.hydroponic_system_id] = reading
+    if not latest:
+        return
+
+    params = []
+    for reading in latest.values():
+        params += [
+            reading.hydroponic_system_id,
+            reading.temperature,
+            reading.ph,
+            reading.tds,
+            reading.timestamp,
+        ]
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(latest))
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL.format(values=values), params)
+
+
+# Recomputes the state from the readings table, e.g. after readings are deleted.
+# Deletes send no signal, so code deleting readings, including queryset and
+# admin deletes, must call this for the affected systems, normally through
+# signals.readings_changed.
+def refresh(system_ids):
+    system_ids = list(system_ids)
+    SystemState.objects.filter(hydroponic_system__in=system_ids).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_SQL, [system_ids])
@@ -1,12 +1,57 @@
+import asyncio
+import csv
+import json
 from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+from unittest.mock import patch
 
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.timezone import make_aware
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
-from .models import HydroponicSystem, Reading
+
+from main.testing import BUDGET_SIZES, QueryBudgetMixin
+
+from . import (
+    analytics,
+    bulk_import,
+    live,
+    ownership,
+    partitioning,
+    pipeline,
+    renderers,
+    response_cache,
+    system_state,
+)
+from .ingest import write_readings
+from .models import (
+    Alert,
+    AlertRule,
+    DailyRollup,
+    HourlyRollup,
+    HydroponicSystem,
+    Reading,
+    SystemState,
+)
+from .pagination import KeysetCursorPagination
+from .parsers import READING_RECORD, READING_RECORDS_MEDIA_TYPE, UNIX_EPOCH
+from .seliarizers import ReadingSerializer, ReadingValuesSerializer
+from .signals import readings_written
 
 User = get_user_model()
 
@@ -22,6 +67,7 @@ class HydroponicSystemTests(APITestCase):
         self.admin_system_pk = 2  # Admin's system (pk=2)
         self.user_system_pk = 3  # User's system (pk=3)
         self.user_system = HydroponicSystem.objects.get(pk=self.user_system_pk)
+        cache.clear()
 
     def test_create_hydroponic_system(self):
         url = reverse("hydroponic system-list")
@@ -178,6 +224,40 @@ class ReadingTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(Reading.objects.filter(id=response.data["id"]).exists())
 
+    def test_create_reading_is_idempotent(self):
+        data = {
+            "hydroponic_system": self.user_system_pk,
+            "temperature": 25.0,
+            "ph": 6.5,
+            "tds": 500.0,
+            "timestamp": "2025-02-20T20:30:00Z",
+        }
+        first = self.client.post(reverse("reading-list"), data)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data["timestamp"], data["timestamp"])
+
+        data["temperature"] = 99.0
+        second = self.client.post(reverse("reading-list"), data)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(second.data["temperature"], 25.0)
+
+    def test_update_onto_another_reading_fails(self):
+        other = Reading.objects.get(pk=3)
+        response = self.client.patch(
+            reverse("reading-detail", args=[2]), {"timestamp": other.timestamp}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("timestamp", response.data)
+
+    def test_create_reading_defaults_to_arrival_time(self):
+        data = {"hydroponic_system": self.user_system_pk, "temperature": 25.0}
+        data.update(ph=6.5, tds=500.0)
+        response = self.client.post(reverse("reading-list"), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reading = Reading.objects.get(pk=response.data["id"])
+        self.assertLess(timezone.now() - reading.timestamp, timedelta(minutes=1))
+
     def test_create_reading_invalid_system(self):
         data = {
             "hydroponic_system": 2,  # Admin's system
@@ -194,3 +274,1934 @@ class ReadingTests(APITestCase):
         response = self.client.delete(reverse("reading-detail", args=[2]))
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Reading.objects.filter(id=2).exists())
+
+
+class BulkReadingTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("reading-bulk")
+
+    def test_bulk_create_json(self):
+        data = [
+            {"hydroponic_system": 3, "temperature": 20.0, "ph": 6.0, "tds": 500.0},
+            {"hydroponic_system": 4, "temperature": 21.0, "ph": 6.1, "tds": 510.0},
+        ]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        ids = [result["id"] for result in response.data["results"]]
+        self.assertEqual(Reading.objects.filter(id__in=ids).count(), 2)
+
+    def test_bulk_create_ndjson(self):
+        body = (
+            '{"hydroponic_system": 3, "temperature": 20.0, "ph": 6.0, "tds": 500.0}\n'
+            "\n"
+            '{"hydroponic_system": 3, "temperature": 22.0, "ph": 6.2, "tds": 520.0}\n'
+        )
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+
+    def test_bulk_rejects_non_finite_values(self):
+        body = '{"hydroponic_system": 3, "temperature": NaN, "ph": 6.0, "tds": 500.0}\n'
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data = [{"hydroponic_system": 3, "temperature": "inf", "ph": 6.0, "tds": 1.0}]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("temperature", response.data["results"][0]["errors"])
+        self.assertEqual(self.client.get(reverse("reading-list")).status_code, 200)
+
+    def test_bulk_partial_failure(self):
+        data = [
+            {"hydroponic_system": 3, "temperature": 20.0, "ph": 6.0, "tds": 500.0},
+            {"hydroponic_system": 2, "temperature": 20.0, "ph": 6.0, "tds": 500.0},
+            {"hydroponic_system": 3, "temperature": "hot", "ph": 6.0, "tds": 500.0},
+        ]
+        readings_before = Reading.objects.count()
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertListEqual(statuses, ["created", "invalid", "invalid"])
+        self.assertIn("hydroponic_system", response.data["results"][1]["errors"])
+        self.assertIn("temperature", response.data["results"][2]["errors"])
+        self.assertEqual(Reading.objects.count(), readings_before + 1)
+
+    def test_bulk_replay_skips_duplicates(self):
+        data = [
+            {
+                "hydroponic_system": 3,
+                "temperature": 20.0 + minute,
+                "ph": 6.0,
+                "tds": 500.0,
+                "timestamp": f"2025-03-01T12:0{minute}:00Z",
+            }
+            for minute in range(3)
+        ]
+        first = self.client.post(self.url, data[:2], format="json")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        readings_before = Reading.objects.count()
+        response = self.client.post(self.url, data + data[2:], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertListEqual(
+            statuses, ["duplicate", "duplicate", "created", "duplicate"]
+        )
+        self.assertEqual(response.data["duplicates"], 3)
+        self.assertEqual(Reading.objects.count(), readings_before + 1)
+
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 0)
+
+    def test_bulk_checks_ownership_once(self):
+        data = [
+            {"hydroponic_system": 3, "temperature": 20.0, "ph": 6.0, "tds": 500.0}
+        ] * 50
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        system_queries = [
+            q for q in queries if 'FROM "Luna_hydroponicsystem"' in q["sql"]
+        ]
+        self.assertEqual(len(system_queries), 1)
+
+    def test_bulk_requires_list(self):
+        response = self.client.post(self.url, {"temperature": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OwnershipTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.minutes = iter(range(1000))
+
+    def reading(self, system_id):
+        timestamp = make_aware(datetime(2025, 3, 1)) + timedelta(
+            minutes=next(self.minutes)
+        )
+        return {
+            "hydroponic_system": system_id,
+            "temperature": 21.0,
+            "ph": 6.0,
+            "tds": 500.0,
+            "timestamp": timestamp.isoformat(),
+        }
+
+    def system_queries(self, write):
+        with CaptureQueriesContext(connection) as queries:
+            response = write()
+        self.assertLess(response.status_code, 300, response.data)
+        return [q for q in queries if 'FROM "Luna_hydroponicsystem"' in q["sql"]]
+
+    def test_writes_check_ownership_once(self):
+        writes = [
+            lambda: self.client.post(
+                reverse("reading-list"), self.reading(3), format="json"
+            ),
+            lambda: self.client.post(
+                reverse("reading-bulk"),
+                [self.reading(3), self.reading(4), self.reading(4)],
+                format="json",
+            ),
+            lambda: self.client.patch(
+                reverse("reading-detail", args=[2]),
+                {"hydroponic_system": 3},
+                format="json",
+            ),
+        ]
+        for write in writes:
+            self.assertEqual(len(self.system_queries(write)), 1)
+
+    def test_other_users_systems(self):
+        admin = User.objects.get(username="admin")
+        self.assertDictEqual(
+            ownership.owners([2, 3, 999]), {2: admin.pk, 3: self.user.pk}
+        )
+        response = self.client.post(
+            reverse("reading-list"), self.reading(2), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("hydroponic_system", response.data)
+        response = self.client.post(
+            reverse("reading-bulk"), [self.reading(999)], format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_change_of_owner(self):
+        self.client.post(reverse("reading-list"), self.reading(3), format="json")
+        system = HydroponicSystem.objects.get(pk=3)
+        system.owner = User.objects.get(username="admin")
+        system.save()
+        response = self.client.post(
+            reverse("reading-list"), self.reading(3), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_readings_filter_on_other_users_system(self):
+        response = self.client.get(reverse("reading-list"), {"hydroponic_system": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(response.data["results"], [])
+
+
+class ReadingPartitioningTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def test_convert_and_maintain_partitions(self):
+        call_command(
+            "partition_readings", "--convert", "--ahead", "1", stdout=StringIO()
+        )
+
+        self.assertTrue(partitioning.is_partitioned())
+        partitions = partitioning.list_partitions()
+        self.assertIn("Luna_reading_2025_02", partitions)
+        self.assertIn(partitioning.DEFAULT_PARTITION, partitions)
+        self.assertEqual(Reading.objects.count(), 4)
+
+        reading = Reading.objects.create(
+            hydroponic_system_id=3, temperature=20.0, ph=6.0, tds=500.0
+        )
+        self.assertGreater(reading.pk, 5)
+
+        call_command("partition_readings", "--retain", "1", stdout=StringIO())
+        self.assertNotIn("Luna_reading_2025_02", partitioning.list_partitions())
+        self.assertEqual(Reading.objects.count(), 1)
+
+    def test_maintain_requires_partitioned_table(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_readings", stdout=StringIO())
+
+
+class ReadingPaginationTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        # Equal timestamps force the primary key tiebreaker to do its job
+        timestamp = make_aware(datetime(2025, 3, 1, 12, 0))
+        Reading.objects.bulk_create(
+            Reading(
+                hydroponic_system=HydroponicSystem.objects.create(
+                    owner=self.user, name=f"s{i}", description=""
+                ),
+                temperature=20 + i,
+                ph=6.0,
+                tds=500.0,
+                timestamp=timestamp,
+            )
+            for i in range(5)
+        )
+
+    def collect(self, params):
+        ids, url, pages = [], reverse("reading-list"), 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            ids.extend(r["id"] for r in response.data["results"])
+            pages += 1
+            if not response.data["next"]:
+                return ids, pages, response
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_walks_all_readings(self):
+        expected = list(
+            Reading.objects.filter(hydroponic_system__owner=self.user)
+            .order_by("-timestamp", "-id")
+            .values_list("id", flat=True)
+        )
+        ids, pages, _ = self.collect({"page_size": 3})
+        self.assertListEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(reverse("reading-list"), {"page_size": 3})
+        self.assertIsNone(first.data["previous"])
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertListEqual(
+            [r["id"] for r in back.data["results"]],
+            [r["id"] for r in first.data["results"]],
+        )
+
+    def test_cursor_with_ordering_and_filters(self):
+        ids, _, _ = self.collect(
+            {
+                "page_size": 2,
+                "ordering": "temperature",
+                "timestamp_after": "2025-03-01T00:00:00Z",
+            }
+        )
+        expected = list(
+            Reading.objects.filter(
+                hydroponic_system__owner=self.user,
+                timestamp__gte=make_aware(datetime(2025, 3, 1)),
+            )
+            .order_by("temperature", "id")
+            .values_list("id", flat=True)
+        )
+        self.assertListEqual(ids, expected)
+
+    def test_page_size_is_capped(self):
+        with patch.object(KeysetCursorPagination, "max_page_size", 2):
+            response = self.client.get(reverse("reading-list"), {"page_size": 100})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("reading-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ReadingAggregateTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("hydroponic system-aggregate", args=[3])
+        start = make_aware(datetime(2025, 3, 1, 12, 0))
+        Reading.objects.filter(hydroponic_system_id=3).delete()
+        for minute, temperature in [(0, 20.0), (2, 22.0), (4, 24.0), (7, 30.0)]:
+            reading = Reading.objects.create(
+                hydroponic_system_id=3, temperature=temperature, ph=6.0, tds=500.0
+            )
+            Reading.objects.filter(pk=reading.pk).update(
+                timestamp=start + timedelta(minutes=minute)
+            )
+
+    def test_aggregate_buckets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"bucket": "5m", "agg": "avg,max"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["bucket_seconds"], 300)
+        first, second = response.data["results"]
+        self.assertEqual(first["count"], 3)
+        self.assertEqual(first["temperature"], {"avg": 22.0, "max": 24.0})
+        self.assertEqual(second["temperature"], {"avg": 30.0, "max": 30.0})
+        self.assertEqual(second["bucket"] - first["bucket"], timedelta(minutes=5))
+        reading_queries = [q for q in queries if 'FROM "Luna_reading"' in q["sql"]]
+        self.assertEqual(len(reading_queries), 1)
+
+    def test_aggregate_accepts_reading_filters(self):
+        response = self.client.get(
+            self.url,
+            {
+                "bucket": "1h",
+                "temperature__gte": 22,
+                "timestamp_before": "2025-03-01T12:05:00Z",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (bucket,) = response.data["results"]
+        self.assertEqual(bucket["count"], 2)
+        self.assertEqual(bucket["temperature"]["min"], 22.0)
+
+    def test_aggregate_invalid_parameters(self):
+        for params in [{"bucket": "5x"}, {"bucket": "0m"}, {"agg": "avg,median"}]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_aggregate_others_system(self):
+        response = self.client.get(reverse("hydroponic system-aggregate", args=[2]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ReadingAnalyticsTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("hydroponic system-analytics", args=[3])
+        self.start = make_aware(datetime(2025, 3, 1, 12, 0))
+        self.values = [
+            (0, 20.0, 6.0, 500.0),
+            (10, 22.0, 6.2, 520.0),
+            (20, 21.0, 6.1, 510.0),
+            (80, 25.0, 5.8, 480.0),
+        ]
+        Reading.objects.filter(hydroponic_system_id=3).delete()
+        Reading.objects.bulk_create(
+            Reading(
+                hydroponic_system_id=3,
+                temperature=temperature,
+                ph=ph,
+                tds=tds,
+                timestamp=self.start + timedelta(minutes=minute),
+            )
+            for minute, temperature, ph, tds in self.values
+        )
+
+    def test_load_arrays(self):
+        arrays = analytics.load_arrays(3)
+        self.assertListEqual(
+            arrays["temperature"].tolist(), [row[1] for row in self.values]
+        )
+        self.assertEqual(
+            analytics.POSTGRES_EPOCH
+            + timedelta(microseconds=int(arrays["timestamp"][1])),
+            self.start + timedelta(minutes=10),
+        )
+        arrays = analytics.load_arrays(
+            3, end=self.start + timedelta(minutes=20), start=self.start
+        )
+        self.assertListEqual(arrays["ph"].tolist(), [6.0, 6.2, 6.1])
+
+    def test_statistics(self):
+        response = self.client.get(self.url, {"window": "30m"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(response.data["window_seconds"], 1800)
+        temperatures = np.array([row[1] for row in self.values])
+        temperature = response.data["metrics"]["temperature"]
+        self.assertAlmostEqual(temperature["mean"], 22.0)
+        self.assertAlmostEqual(temperature["std"], temperatures.std())
+        self.assertEqual((temperature["min"], temperature["max"]), (20.0, 25.0))
+        self.assertAlmostEqual(temperature["percentiles"]["p50"], 21.5)
+        self.assertAlmostEqual(
+            response.data["correlations"]["ph_tds"],
+            np.corrcoef(
+                [row[2] for row in self.values], [row[3] for row in self.values]
+            )[0, 1],
+        )
+
+        rolling = response.data["rolling"]
+        self.assertEqual(len(rolling), 4)
+        self.assertEqual(rolling[2]["timestamp"], self.start + timedelta(minutes=20))
+        # The last reading is alone in its window
+        self.assertAlmostEqual(rolling[2]["temperature"]["mean"], 21.0)
+        self.assertAlmostEqual(rolling[2]["tds"]["std"], np.std([500, 520, 510]))
+        self.assertEqual(rolling[3]["temperature"], {"mean": 25.0, "std": 0.0})
+
+    def test_points_and_range(self):
+        response = self.client.get(
+            self.url,
+            {"points": 2, "timestamp_after": "2025-03-01T12:05:00Z"},
+        )
+        self.assertEqual(response.data["count"], 3)
+        self.assertListEqual(
+            [point["timestamp"] for point in response.data["rolling"]],
+            [self.start + timedelta(minutes=10), self.start + timedelta(minutes=80)],
+        )
+
+    def test_empty_range(self):
+        response = self.client.get(
+            self.url, {"timestamp_after": "2026-01-01T00:00:00Z"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "count": 0,
+                "window_seconds": 3600,
+                "metrics": {},
+                "correlations": {},
+                "rolling": [],
+            },
+        )
+
+    def test_cached_until_readings_change(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.data, first.data)
+        self.assertFalse([q for q in queries if 'FROM "Luna_reading"' in q["sql"]])
+
+        self.client.post(
+            reverse("reading-list"),
+            {"hydroponic_system": 3, "temperature": 1.0, "ph": 1.0, "tds": 1.0},
+        )
+        self.assertEqual(self.client.get(self.url).data["count"], 5)
+
+    def test_invalid_parameters(self):
+        for params in [{"window": "5x"}, {"points": 0}, {"points": 5001}]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_others_system(self):
+        response = self.client.get(reverse("hydroponic system-analytics", args=[2]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ReadingRollupTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.add_readings(
+            [
+                (datetime(2024, 1, 1, 10, 0), 20.0),
+                (datetime(2024, 1, 1, 10, 30), 24.0),
+                (datetime(2024, 1, 1, 11, 10), 30.0),
+                (datetime(2024, 1, 2, 9, 0), 10.0),
+            ]
+        )
+        self.recent = Reading.objects.create(
+            hydroponic_system_id=3, temperature=40.0, ph=6.0, tds=500.0
+        )
+
+    def add_readings(self, readings):
+        Reading.objects.bulk_create(
+            Reading(
+                hydroponic_system_id=3,
+                temperature=temperature,
+                ph=6.0,
+                tds=500.0,
+                timestamp=make_aware(timestamp),
+            )
+            for timestamp, temperature in readings
+        )
+
+    def roll_up(self, *args):
+        stdout = StringIO()
+        call_command("rollup_readings", "--batch-size", "2", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def rollups(self, model):
+        return list(
+            model.objects.filter(hydroponic_system=3, bucket__year=2024)
+            .order_by("bucket")
+            .values_list("bucket", "count", "temperature_min", "temperature_avg")
+        )
+
+    def test_roll_up_old_readings(self):
+        output = self.roll_up()
+        # The fixture readings are past retention as well
+        self.assertIn("Rolled up 8 readings", output)
+        self.assertListEqual(
+            list(Reading.objects.values_list("pk", flat=True)), [self.recent.pk]
+        )
+        self.assertListEqual(
+            self.rollups(HourlyRollup),
+            [
+                (make_aware(datetime(2024, 1, 1, 10)), 2, 20.0, 22.0),
+                (make_aware(datetime(2024, 1, 1, 11)), 1, 30.0, 30.0),
+                (make_aware(datetime(2024, 1, 2, 9)), 1, 10.0, 10.0),
+            ],
+        )
+        self.assertListEqual(
+            self.rollups(DailyRollup),
+            [
+                (make_aware(datetime(2024, 1, 1)), 3, 20.0, 74.0 / 3),
+                (make_aware(datetime(2024, 1, 2)), 1, 10.0, 10.0),
+            ],
+        )
+
+    def test_roll_up_merges_late_readings(self):
+        self.roll_up()
+        self.add_readings([(datetime(2024, 1, 1, 10, 45), 16.0)])
+        self.roll_up()
+        first_hour = self.rollups(HourlyRollup)[0]
+        self.assertEqual(
+            first_hour, (make_aware(datetime(2024, 1, 1, 10)), 3, 16.0, 20.0)
+        )
+
+    def test_roll_up_detaches_partitions(self):
+        # Deferred foreign key checks of setUp would block the conversion
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        partitioning.convert_to_partitioned()
+        self.roll_up("--drop")
+        self.assertNotIn("Luna_reading_2024_01", partitioning.list_partitions())
+        self.assertEqual(Reading.objects.count(), 1)
+        self.assertEqual(len(self.rollups(HourlyRollup)), 3)
+
+    def test_aggregate_reads_rollups(self):
+        self.roll_up()
+        url = reverse("hydroponic system-aggregate", args=[3])
+        response = self.client.get(
+            url, {"bucket": "1d", "timestamp_after": "2024-01-01T00:00:00Z"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = [bucket["count"] for bucket in response.data["results"]]
+        # Two rolled up days, the fixture readings of 2025 and the recent one
+        self.assertListEqual(counts, [3, 1, 2, 1])
+        self.assertEqual(response.data["results"][0]["temperature"]["max"], 30.0)
+
+        response = self.client.get(
+            url, {"bucket": "2h", "timestamp_before": "2024-01-01T23:00:00Z"}
+        )
+        (bucket,) = response.data["results"]
+        self.assertEqual(bucket["count"], 3)
+        self.assertAlmostEqual(bucket["temperature"]["avg"], 74.0 / 3)
+
+        # Neither sub-hour buckets nor value filters can use the rollups
+        response = self.client.get(url, {"bucket": "30m"})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(url, {"bucket": "1h", "temperature__gte": 0})
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_merge_with_raw_bucket(self):
+        self.roll_up()
+        self.add_readings([(datetime(2024, 1, 1, 12, 0), 8.0)])
+        response = self.client.get(
+            reverse("hydroponic system-aggregate", args=[3]),
+            {"bucket": "1d", "timestamp_before": "2024-01-01T23:00:00Z"},
+        )
+        (bucket,) = response.data["results"]
+        self.assertEqual(bucket["count"], 4)
+        self.assertEqual(bucket["temperature"]["min"], 8.0)
+        self.assertAlmostEqual(bucket["temperature"]["avg"], 82.0 / 4)
+
+
+class LatestReadingsTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        cache.clear()
+
+    def reading_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [q for q in queries if 'FROM "Luna_reading"' in q["sql"]]
+
+    def test_detail_is_served_from_cache(self):
+        url = reverse("hydroponic system-detail", args=[3])
+        response, queries = self.reading_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertListEqual(
+            [r["id"] for r in response.data["latest_readings"]], [3, 2]
+        )
+
+        response, queries = self.reading_queries(url)
+        self.assertEqual(len(queries), 0)
+        self.assertListEqual(
+            [r["id"] for r in response.data["latest_readings"]], [3, 2]
+        )
+
+    def test_list_embeds_latest_reading_without_n_plus_one(self):
+        for i in range(5):
+            HydroponicSystem.objects.create(
+                owner=self.user, name=f"s{i}", description=""
+            )
+        response, queries = self.reading_queries(reverse("hydroponic system-list"))
+        self.assertEqual(len(queries), 1)
+        latest = {s["id"]: s["latest_reading"] for s in response.data["results"]}
+        self.assertEqual(latest[3]["id"], 3)
+        self.assertEqual(latest[4]["id"], 4)
+
+    def test_writes_update_cached_readings(self):
+        url = reverse("hydroponic system-detail", args=[3])
+        self.reading_queries(url)
+
+        self.client.post(
+            reverse("reading-list"),
+            {"hydroponic_system": 3, "temperature": 25.0, "ph": 6.5, "tds": 500.0},
+        )
+        bulk = self.client.post(
+            reverse("reading-bulk"),
+            [{"hydroponic_system": 3, "temperature": 26.0, "ph": 6.5, "tds": 500.0}],
+            format="json",
+        )
+        response, queries = self.reading_queries(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            response.data["latest_readings"][0]["id"], bulk.data["results"][0]["id"]
+        )
+        self.assertEqual(len(response.data["latest_readings"]), 4)
+
+    def test_edits_update_both_systems(self):
+        self.reading_queries(reverse("hydroponic system-detail", args=[3]))
+        self.reading_queries(reverse("hydroponic system-detail", args=[4]))
+
+        response = self.client.patch(
+            reverse("reading-detail", args=[3]),
+            {"hydroponic_system": 4, "temperature": 5.0},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response, _ = self.reading_queries(
+            reverse("hydroponic system-detail", args=[3])
+        )
+        self.assertListEqual([r["id"] for r in response.data["latest_readings"]], [2])
+        response, _ = self.reading_queries(
+            reverse("hydroponic system-detail", args=[4])
+        )
+        self.assertIn(3, [r["id"] for r in response.data["latest_readings"]])
+
+        # Back in time, the state follows the reading that is now the latest
+        self.client.patch(
+            reverse("reading-detail", args=[4]), {"timestamp": "2020-01-01T00:00:00Z"}
+        )
+        latest = Reading.objects.filter(hydroponic_system_id=4).latest("timestamp")
+        state = SystemState.objects.get(hydroponic_system_id=4)
+        self.assertEqual(
+            (state.temperature, state.last_seen), (latest.temperature, latest.timestamp)
+        )
+
+    def test_cache_is_capped(self):
+        url = reverse("hydroponic system-detail", args=[3])
+        self.reading_queries(url)
+        for i in range(12):
+            Reading.objects.create(
+                hydroponic_system_id=3, temperature=i, ph=6.0, tds=1.0
+            )
+        response, queries = self.reading_queries(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(response.data["latest_readings"]), 10)
+        self.assertEqual(response.data["latest_readings"][0]["temperature"], 11.0)
+
+    def test_deleting_reading_invalidates_cache(self):
+        url = reverse("hydroponic system-detail", args=[3])
+        self.reading_queries(url)
+        self.client.delete(reverse("reading-detail", args=[3]))
+        response, _ = self.reading_queries(url)
+        self.assertListEqual([r["id"] for r in response.data["latest_readings"]], [2])
+
+    def test_admin_deletes_invalidate_cache(self):
+        url = reverse("hydroponic system-detail", args=[3])
+        self.reading_queries(url)
+        version = response_cache.version(self.user.pk)
+        self.client.force_login(User.objects.get(username="admin"))
+
+        response = self.client.post(
+            reverse("admin:Luna_reading_delete", args=[3]), {"post": "yes"}
+        )
+        self.assertEqual(response.status_code, 302)
+        response, _ = self.reading_queries(url)
+        self.assertListEqual([r["id"] for r in response.data["latest_readings"]], [2])
+        self.assertNotEqual(response_cache.version(self.user.pk), version)
+
+        version = response_cache.version(self.user.pk)
+        response = self.client.post(
+            reverse("admin:Luna_reading_changelist"),
+            {"action": "delete_selected", "_selected_action": [2], "post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+        response, _ = self.reading_queries(url)
+        self.assertListEqual(response.data["latest_readings"], [])
+        self.assertNotEqual(response_cache.version(self.user.pk), version)
+
+
+class ResponseCacheTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.list_url = reverse("hydroponic system-list")
+        self.detail_url = reverse("hydroponic system-detail", args=[3])
+
+    def poll(self, url, etag, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        return response, queries
+
+    def test_unchanged_poll_is_not_modified(self):
+        first = self.client.get(self.list_url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("Authorization", first["Vary"])
+
+        response, queries = self.poll(self.list_url, first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], first["ETag"])
+        self.assertEqual(len(queries), 0)
+
+        response, queries = self.poll(self.list_url, '"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, first.data)
+        self.assertEqual(len(queries), 0)
+
+    def test_etag_depends_on_action_and_parameters(self):
+        etags = {
+            self.client.get(self.list_url)["ETag"],
+            self.client.get(self.list_url, {"page": 1})["ETag"],
+            self.client.get(self.detail_url)["ETag"],
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_writes_invalidate(self):
+        writes = [
+            lambda: self.client.patch(self.detail_url, {"name": "Renamed"}),
+            lambda: self.client.post(
+                reverse("reading-list"),
+                {"hydroponic_system": 3, "temperature": 1.0, "ph": 1.0, "tds": 1.0},
+            ),
+            lambda: self.client.post(
+                reverse("reading-bulk"),
+                [{"hydroponic_system": 4, "temperature": 1.0, "ph": 1.0, "tds": 1.0}],
+                format="json",
+            ),
+            lambda: self.client.delete(reverse("reading-detail", args=[2])),
+            lambda: self.client.post(
+                self.list_url, {"name": "New", "description": "New"}
+            ),
+        ]
+        for write in writes:
+            etag = self.client.get(self.detail_url)["ETag"]
+            write()
+            response, _ = self.poll(self.detail_url, etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_change_of_owner_invalidates_previous_owner(self):
+        self.client.get(self.detail_url)
+        etag = self.client.get(self.list_url)["ETag"]
+        system = HydroponicSystem.objects.get(pk=3)
+        system.owner = User.objects.get(username="admin")
+        system.save()
+        self.assertEqual(
+            self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND
+        )
+        response, _ = self.poll(self.list_url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(3, [s["id"] for s in response.data["results"]])
+
+    def test_other_users_writes_do_not_invalidate(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        HydroponicSystem.objects.filter(pk=2).get().save()
+        response, _ = self.poll(self.list_url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cache_is_per_user(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        admin = User.objects.get(username="admin")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=admin).key}"
+        )
+        response, _ = self.poll(self.list_url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual([s["id"] for s in response.data["results"]], [2])
+
+    def test_errors_are_not_cached(self):
+        url = reverse("hydroponic system-detail", args=[2])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", self.client.get(url))
+
+
+class SystemStateTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("hydroponic system-state")
+
+    def test_writes_upsert_state(self):
+        self.client.post(
+            reverse("reading-list"),
+            {"hydroponic_system": 3, "temperature": 25.0, "ph": 6.5, "tds": 500.0},
+        )
+        self.client.post(
+            reverse("reading-bulk"),
+            [
+                {"hydroponic_system": 3, "temperature": 26.0, "ph": 6.6, "tds": 510.0},
+                {"hydroponic_system": 4, "temperature": 27.0, "ph": 6.7, "tds": 520.0},
+                {"hydroponic_system": 3, "temperature": 28.0, "ph": 6.8, "tds": 530.0},
+            ],
+            format="json",
+        )
+        self.client.post(
+            reverse("reading-bulk"),
+            [{"hydroponic_system": 2, "temperature": 1.0, "ph": 1.0, "tds": 1.0}],
+            format="json",
+        )
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        states = {s["hydroponic_system"]: s for s in response.data["results"]}
+        self.assertSetEqual(set(states), {3, 4})
+        self.assertEqual(states[3]["temperature"], 28.0)
+        self.assertEqual(states[3]["name"], "mySystem2")
+        self.assertEqual(states[4]["tds"], 520.0)
+
+    def test_older_reading_does_not_replace_state(self):
+        now = make_aware(datetime(2025, 3, 1, 12, 0))
+        newer = Reading(
+            pk=100,
+            hydroponic_system_id=3,
+            temperature=2.0,
+            ph=1.0,
+            tds=1.0,
+            timestamp=now,
+        )
+        older = Reading(
+            pk=101,
+            hydroponic_system_id=3,
+            temperature=1.0,
+            ph=1.0,
+            tds=1.0,
+            timestamp=now - timedelta(minutes=1),
+        )
+        system_state.upsert([newer])
+        system_state.upsert([older])
+        self.assertEqual(SystemState.objects.get(pk=3).temperature, 2.0)
+
+    def test_deleting_reading_refreshes_state(self):
+        self.client.post(
+            reverse("reading-list"),
+            {"hydroponic_system": 4, "temperature": 25.0, "ph": 6.5, "tds": 500.0},
+        )
+        latest = Reading.objects.filter(hydroponic_system_id=4).latest("id")
+        self.client.delete(reverse("reading-detail", args=[latest.pk]))
+        self.assertEqual(SystemState.objects.get(pk=4).tds, 2000.0)
+
+    def test_admin_deletes_refresh_state(self):
+        system_state.refresh([3, 4])
+        self.assertEqual(SystemState.objects.filter(pk__in=[3, 4]).count(), 2)
+        self.client.force_login(User.objects.get(username="admin"))
+        response = self.client.post(
+            reverse("admin:Luna_reading_changelist"),
+            {"action": "delete_selected", "_selected_action": [2, 3, 4], "post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(SystemState.objects.filter(pk__in=[3, 4]).exists())
+
+
+class ReadingExportTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("reading-export")
+
+    def export(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_export_csv(self):
+        response, body = self.export({"format": "csv"})
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        rows = list(csv.reader(body.decode().splitlines()))
+        self.assertEqual(rows[0][0], "id")
+        self.assertSetEqual({row[0] for row in rows[1:]}, {"2", "3", "4"})
+        self.assertEqual(rows[1][-1], "2025-02-20T20:22:48.347000+00:00")
+
+    def test_export_ndjson_with_filters(self):
+        response, body = self.export(
+            {"format": "ndjson", "hydroponic_system": 3, "ordering": "timestamp"}
+        )
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertListEqual([row["id"] for row in rows], [2, 3])
+        self.assertEqual(rows[0]["tds"], 33.0)
+
+    @skipUnless(renderers.pyarrow, "pyarrow is not installed")
+    def test_export_parquet(self):
+        _, body = self.export({"format": "parquet"})
+        table = renderers.pyarrow.parquet.read_table(
+            renderers.pyarrow.BufferReader(body)
+        )
+        self.assertSetEqual(set(table.column("id").to_pylist()), {2, 3, 4})
+
+    def test_export_streams_in_chunks(self):
+        start = make_aware(datetime(2025, 3, 1))
+        Reading.objects.bulk_create(
+            Reading(
+                hydroponic_system_id=3,
+                temperature=i,
+                ph=6.0,
+                tds=1.0,
+                timestamp=start + timedelta(seconds=i),
+            )
+            for i in range(settings.READINGS_EXPORT_CHUNK_SIZE + 1)
+        )
+        response = self.client.get(self.url, {"format": "ndjson"})
+        chunks = [chunk for chunk in response.streaming_content if chunk]
+        self.assertEqual(len(chunks), 2)
+
+
+class ReadingRecordsTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.start = make_aware(datetime(2025, 3, 1, 12, 0))
+
+    def records(self, *rows):
+        return b"".join(
+            READING_RECORD.pack(
+                system_id,
+                (timestamp - UNIX_EPOCH) // timedelta(microseconds=1),
+                temperature,
+                ph,
+                tds,
+            )
+            for system_id, timestamp, temperature, ph, tds in rows
+        )
+
+    def post(self, url, body, **extra):
+        return self.client.generic(
+            "POST", url, body, content_type=READING_RECORDS_MEDIA_TYPE, **extra
+        )
+
+    def test_bulk(self):
+        body = self.records(
+            (3, self.start, 21.5, 6.1, 810.0),
+            (4, self.start, 22.0, 6.2, 820.0),
+            (2, self.start, 22.0, 6.2, 820.0),
+        )
+        self.assertEqual(len(body), 3 * 40)
+        response = self.post(reverse("reading-bulk"), body)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 1))
+        reading = Reading.objects.get(hydroponic_system_id=3, timestamp=self.start)
+        self.assertEqual((reading.temperature, reading.tds), (21.5, 810.0))
+
+        response = self.post(
+            reverse("reading-bulk"), body, HTTP_ACCEPT=READING_RECORDS_MEDIA_TYPE
+        )
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_create(self):
+        response = self.post(
+            reverse("reading-list"),
+            self.records((3, self.start, 21.5, 6.1, 810.0)),
+            HTTP_ACCEPT=READING_RECORDS_MEDIA_TYPE,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["Content-Type"], READING_RECORDS_MEDIA_TYPE)
+        self.assertEqual(
+            response.content, self.records((3, self.start, 21.5, 6.1, 810.0))
+        )
+
+    def test_invalid_bodies(self):
+        two = self.records(
+            (3, self.start, 21.5, 6.1, 810.0),
+            (3, self.start + timedelta(minutes=1), 21.5, 6.1, 810.0),
+        )
+        infinite = self.records((3, self.start, float("inf"), 6.1, 810.0))
+        for body in [
+            two,
+            two[:-1],
+            self.records((2, self.start, 1.0, 1.0, 1.0)),
+            infinite,
+        ]:
+            response = self.post(
+                reverse("reading-list"), body, HTTP_ACCEPT=READING_RECORDS_MEDIA_TYPE
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            # Errors are rendered as JSON
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertIsInstance(json.loads(response.content), dict)
+        for body in [two[:-1], infinite]:
+            response = self.post(reverse("reading-bulk"), body)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_and_retrieve(self):
+        expected = {
+            (reading.hydroponic_system_id, reading.timestamp): reading
+            for reading in Reading.objects.filter(hydroponic_system__owner=self.user)
+        }
+        response = self.client.get(
+            reverse("reading-list"),
+            {"page_size": 2},
+            HTTP_ACCEPT=READING_RECORDS_MEDIA_TYPE,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('rel="next"', response["Link"])
+        rows = list(READING_RECORD.iter_unpack(response.content))
+        self.assertEqual(len(rows), 2)
+        for system_id, microseconds, temperature, ph, tds in rows:
+            reading = expected[
+                (system_id, UNIX_EPOCH + timedelta(microseconds=microseconds))
+            ]
+            self.assertEqual(
+                (temperature, ph, tds), (reading.temperature, reading.ph, reading.tds)
+            )
+
+        response = self.client.get(
+            reverse("reading-detail", args=[4]), {"format": "bin"}
+        )
+        self.assertEqual(len(response.content), READING_RECORD.size)
+        self.assertEqual(READING_RECORD.unpack(response.content)[0], 4)
+
+    def test_export(self):
+        response = self.client.get(reverse("reading-export"), {"format": "bin"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="readings.bin"'
+        )
+        body = b"".join(response.streaming_content)
+        self.assertEqual(len(body), 3 * READING_RECORD.size)
+
+
+class ReadingValuesSerializerTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def test_matches_reading_serializer(self):
+        readings = Reading.objects.order_by("id")
+        Reading.objects.filter(pk=2).update(
+            timestamp=make_aware(datetime(2025, 3, 1, 12, 0))
+        )
+        expected = ReadingSerializer(readings, many=True).data
+        rows = readings.values(*ReadingValuesSerializer.fields)
+        self.assertListEqual(
+            ReadingValuesSerializer(rows, many=True).data, [dict(r) for r in expected]
+        )
+        self.assertDictEqual(ReadingValuesSerializer(rows[0]).data, dict(expected[0]))
+
+
+@override_settings(READINGS_ASYNC_INGEST=True)
+class AsyncIngestTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        # No background thread, tests flush the queue themselves
+        self.writer = pipeline.ReadingWriter(
+            maxsize=3, batch_size=2, flush_interval=1, timeout=0, autostart=False
+        )
+        patcher = patch.object(pipeline, "writer", self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reading(self, system=3):
+        return {"hydroponic_system": system, "temperature": 20.0, "ph": 6.0, "tds": 1.0}
+
+    def test_create_is_queued(self):
+        readings_before = Reading.objects.count()
+        response = self.client.post(reverse("reading-list"), self.reading())
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(self.writer), 1)
+        self.assertEqual(Reading.objects.count(), readings_before)
+
+        self.writer.flush()
+        self.assertEqual(len(self.writer), 0)
+        self.assertEqual(Reading.objects.count(), readings_before + 1)
+        self.assertEqual(SystemState.objects.get(pk=3).temperature, 20.0)
+
+    def test_create_is_still_validated(self):
+        response = self.client.post(reverse("reading-list"), self.reading(system=2))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.writer), 0)
+
+    def test_bulk_is_queued(self):
+        data = [self.reading(), self.reading(system=2), self.reading(system=4)]
+        response = self.client.post(reverse("reading-bulk"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertListEqual(statuses, ["queued", "invalid", "queued"])
+        self.assertEqual(len(self.writer), 2)
+
+    def test_full_queue_is_rejected(self):
+        data = [self.reading()] * 3
+        response = self.client.post(reverse("reading-bulk"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.post(reverse("reading-list"), self.reading())
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(len(self.writer), 3)
+
+    def test_batch_larger_than_queue_is_rejected_at_once(self):
+        # Would wait out the timeout if the batch were treated like a full queue
+        self.writer.timeout = 30
+        data = [self.reading()] * 4
+        response = self.client.post(reverse("reading-bulk"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(len(self.writer), 0)
+
+    def test_failing_readings_do_not_drop_the_batch(self):
+        readings_before = Reading.objects.count()
+        system = HydroponicSystem.objects.create(
+            owner=self.user, name="Deleted", description=""
+        )
+        self.writer.submit(
+            [
+                Reading(
+                    hydroponic_system_id=system_id,
+                    temperature=20.0,
+                    ph=6.0,
+                    tds=1.0,
+                    timestamp=make_aware(datetime(2025, 3, 1, 12)),
+                )
+                for system_id in [3, system.pk, 4]
+            ]
+        )
+        # Deleted after the readings were validated and queued
+        system.delete()
+        with self.assertLogs("Luna.pipeline", "ERROR") as logs:
+            self.writer.flush()
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(Reading.objects.count(), readings_before + 2)
+
+    def test_stop_drains_queue(self):
+        readings_before = Reading.objects.count()
+        self.writer.submit(
+            [
+                Reading(
+                    hydroponic_system_id=3,
+                    temperature=i,
+                    ph=6.0,
+                    tds=1.0,
+                    timestamp=make_aware(datetime(2025, 3, 1, i)),
+                )
+                for i in range(3)
+            ]
+        )
+        self.writer.stop()
+        self.assertEqual(len(self.writer), 0)
+        self.assertEqual(Reading.objects.count(), readings_before + 3)
+
+
+class ImportReadingsTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content)
+        return str(path)
+
+    def import_readings(self, *args, **options):
+        stdout = StringIO()
+        call_command(
+            "import_readings", *args, owner="newuser", stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def test_import_csv(self):
+        path = self.write(
+            "readings.csv",
+            "id,hydroponic_system,temperature,ph,tds,timestamp\n"
+            "1,3,20.5,6.1,500,2024-01-01T00:00:00+00:00\n"
+            "2,4,21.5,6.2,510,2024-01-01T00:01:00\n",
+        )
+        output = self.import_readings(path)
+        self.assertIn("Imported 2 readings", output)
+        imported = Reading.objects.filter(timestamp__year=2024).order_by("timestamp")
+        self.assertListEqual(
+            list(imported.values_list("hydroponic_system", "temperature")),
+            [(3, 20.5), (4, 21.5)],
+        )
+        self.assertEqual(imported[1].timestamp, make_aware(datetime(2024, 1, 1, 0, 1)))
+
+    def test_import_ndjson_refreshes_state(self):
+        path = self.write(
+            "readings.ndjson",
+            '{"hydroponic_system": 3, "temperature": 30.0, "ph": 6.0, "tds": 1.0,'
+            ' "timestamp": "2030-01-01T00:00:00Z"}\n\n',
+        )
+        self.import_readings(path)
+        self.assertEqual(SystemState.objects.get(pk=3).temperature, 30.0)
+
+    def test_import_skips_duplicates(self):
+        path = self.write(
+            "readings.csv",
+            "hydroponic_system,temperature,ph,tds,timestamp\n"
+            "3,20.0,6.0,500,2025-02-20T20:20:29.797Z\n"
+            "3,20.0,6.0,500,2024-01-01T00:00:00Z\n"
+            "3,21.0,6.0,500,2024-01-01T00:00:00Z\n",
+        )
+        output = self.import_readings(path)
+        self.assertIn("imported 1 rows", output)
+        self.assertIn("skipped 2 duplicates", output)
+        self.assertEqual(Reading.objects.get(timestamp__year=2024).temperature, 20.0)
+
+    def test_rejects_foreign_system(self):
+        path = self.write(
+            "readings.csv",
+            "hydroponic_system,temperature,ph,tds,timestamp\n"
+            "3,20.0,6.0,500,2024-01-01T00:00:00Z\n"
+            "2,20.0,6.0,500,2024-01-01T00:00:00Z\n",
+        )
+        readings_before = Reading.objects.count()
+        with self.assertRaises(CommandError):
+            self.import_readings(path, stderr=StringIO())
+        self.assertEqual(Reading.objects.count(), readings_before)
+
+    def test_skip_invalid(self):
+        path = self.write(
+            "readings.csv",
+            "hydroponic_system,temperature,ph,tds,timestamp\n"
+            "3,20.0,6.0,500,2024-01-01T00:00:00Z\n"
+            "2,20.0,6.0,500,2024-01-01T00:00:00Z\n"
+            "3,hot,6.0,500,2024-01-01T00:00:00Z\n"
+            "3,20.0,6.0,500,yesterday\n",
+        )
+        output = self.import_readings(path, skip_invalid=True)
+        self.assertIn("skipped 3 invalid rows", output)
+        self.assertEqual(Reading.objects.filter(timestamp__year=2024).count(), 1)
+
+    def test_reports_progress(self):
+        path = self.write(
+            "readings.csv",
+            "hydroponic_system,temperature,ph,tds,timestamp\n"
+            + "3,20.0,6.0,500,2024-01-01T00:00:00Z\n" * 3,
+        )
+        with patch.object(bulk_import, "PROGRESS_EVERY", 2):
+            output = self.import_readings(path)
+        self.assertIn("readings.csv: 2 rows (", output)
+
+
+class ParallelImportReadingsTests(TransactionTestCase):
+    # Worker processes only see committed rows
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def test_import_files_in_parallel(self):
+        with TemporaryDirectory() as directory:
+            paths = []
+            for system in (3, 4):
+                path = Path(directory) / f"system-{system}.csv"
+                path.write_text(
+                    "hydroponic_system,temperature,ph,tds,timestamp\n"
+                    + "".join(
+                        f"{system},20.0,6.0,500,2024-01-01T00:0{i}:00Z\n"
+                        for i in range(5)
+                    )
+                )
+                paths.append(str(path))
+            stdout = StringIO()
+            call_command(
+                "import_readings", *paths, owner="newuser", workers=2, stdout=stdout
+            )
+        self.assertIn("Imported 10 readings from 2 files", stdout.getvalue())
+        self.assertEqual(Reading.objects.filter(hydroponic_system=3).count(), 7)
+        self.assertEqual(Reading.objects.filter(hydroponic_system=4).count(), 6)
+
+
+class AsyncReadViewTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def compare(self, sync_url, async_url, params=None):
+        expected = self.client.get(sync_url, params, format="json")
+        response = self.client.get(async_url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response["Content-Type"], "application/json")
+        data = json.loads(response.content.decode().replace(async_url, sync_url))
+        self.assertEqual(data, json.loads(expected.content))
+        return data
+
+    def test_systems(self):
+        self.compare(reverse("hydroponic system-list"), reverse("async-system-list"))
+        self.compare(
+            reverse("hydroponic system-detail", args=[3]),
+            reverse("async-system-detail", args=[3]),
+        )
+        self.compare(
+            reverse("hydroponic system-detail", args=[2]),
+            reverse("async-system-detail", args=[2]),
+        )
+
+    def test_systems_pages(self):
+        HydroponicSystem.objects.bulk_create(
+            HydroponicSystem(owner=self.user, name=f"System {index}")
+            for index in range(20)
+        )
+        url = reverse("async-system-list")
+        for page in [2, "last", 9, "x"]:
+            self.compare(reverse("hydroponic system-list"), url, {"page": page})
+
+    def test_readings(self):
+        for params in [
+            {},
+            {"page_size": 1, "ordering": "timestamp"},
+            {"hydroponic_system": 3, "ph__gte": 0},
+            {"timestamp_after": "yesterday"},
+            {"cursor": "invalid"},
+        ]:
+            self.compare(reverse("reading-list"), reverse("async-reading-list"), params)
+
+    def test_not_modified(self):
+        url = reverse("async-system-list")
+        etag = self.client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 0)
+
+        self.client.post(
+            reverse("reading-list"),
+            {"hydroponic_system": 3, "temperature": 1.0, "ph": 1.0, "tds": 1.0},
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_authentication_and_methods(self):
+        url = reverse("async-reading-list")
+        response = self.client.post(url, {})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.client.credentials()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_client(self):
+        response = await self.async_client.get(
+            reverse("async-reading-list"),
+            {"hydroponic_system": 3},
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertSetEqual(
+            {row["id"] for row in json.loads(response.content)["results"]}, {2, 3}
+        )
+
+
+class ReadingStreamTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.url = reverse("reading-stream")
+        self.addCleanup(live.broadcaster.subscriptions.clear)
+
+    def write_readings(self, *systems):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reading.objects.bulk_create(
+                Reading(hydroponic_system_id=system, temperature=1.0, ph=1.0, tds=1.0)
+                for system in systems
+            )
+            # bulk_create itself sends nothing, the API write paths do
+            readings = Reading.objects.filter(hydroponic_system__in=systems).order_by(
+                "-id"
+            )[: len(systems)]
+            readings_written.send(sender=Reading, readings=list(readings))
+
+    async def ticket(self):
+        response = await self.async_client.post(
+            reverse("reading-stream-ticket"),
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["ticket"]
+
+    async def open_stream(self, params):
+        response = await self.async_client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        return stream
+
+    async def next_event(self, stream):
+        event = (await asyncio.wait_for(anext(stream), 5)).decode()
+        name, data = event.strip().split("\n")
+        self.assertEqual(name, "event: readings")
+        return json.loads(data.removeprefix("data: "))
+
+    async def test_streams_readings_of_own_systems(self):
+        stream = await self.open_stream({"ticket": await self.ticket()})
+        await sync_to_async(self.write_readings)(2, 3)
+        (reading,) = await self.next_event(stream)
+        self.assertEqual(reading["hydroponic_system"], 3)
+        self.assertSetEqual(set(reading), set(ReadingValuesSerializer.fields))
+        await stream.aclose()
+
+    async def test_streams_selected_systems(self):
+        stream = await self.open_stream(
+            {"ticket": await self.ticket(), "hydroponic_system": 4}
+        )
+        await sync_to_async(self.write_readings)(3)
+        await sync_to_async(self.write_readings)(4)
+        (reading,) = await self.next_event(stream)
+        self.assertEqual(reading["hydroponic_system"], 4)
+        await stream.aclose()
+
+    async def test_session_authentication(self):
+        await self.async_client.aforce_login(self.user)
+        stream = await self.open_stream({})
+        await stream.aclose()
+
+    async def test_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        # The API token is never accepted in the URL
+        response = await self.async_client.get(self.url, {"token": self.token.key})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(self.url, {"ticket": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.post(reverse("reading-stream-ticket"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        with override_settings(READINGS_STREAM_TICKET_MAX_AGE=-1):
+            response = await self.async_client.get(
+                self.url, {"ticket": live.issue_ticket(self.user.pk)}
+            )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(
+            self.url,
+            {"hydroponic_system": 2},
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_needs_asgi(self):
+        # The test client is a WSGI request, the endpoint must refuse it
+        # instead of streaming nothing
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    @override_settings(READINGS_STREAM_QUEUE_SIZE=2)
+    def test_slow_subscriber_is_disconnected(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = live.broadcaster.subscribe(self.user.pk, loop=loop)
+        self.addCleanup(live.broadcaster.unsubscribe, subscription)
+        for _ in range(3):
+            self.write_readings(3)
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertIsNone(subscription.queue.get_nowait())
+
+
+@override_settings(READINGS_STREAM_BACKEND="postgres")
+class ReadingStreamNotifyTests(TransactionTestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def test_readings_reach_listener(self):
+        live.listener.start()
+        self.addCleanup(live.listener.stop)
+        self.assertTrue(live.listener.listening.wait(5))
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        owner_id = User.objects.get(username="newuser").pk
+        subscription = live.broadcaster.subscribe(owner_id, loop=loop)
+        self.addCleanup(live.broadcaster.unsubscribe, subscription)
+
+        Reading.objects.create(hydroponic_system_id=3, temperature=1, ph=1, tds=1)
+        data = loop.run_until_complete(asyncio.wait_for(subscription.queue.get(), 5))
+        self.assertEqual(json.loads(data)[0]["hydroponic_system"], 3)
+
+
+class AlertTests(APITestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        # Compiled rules and their state live in the cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.get(username="newuser")
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.start = make_aware(datetime(2025, 3, 1))
+
+    def create_rule(self, **data):
+        response = self.client.post(
+            reverse("alert rule-list"),
+            {"hydroponic_system": 3, "metric": "ph", **data},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return AlertRule.objects.get(pk=response.data["id"])
+
+    def send(self, *values, system=3, start=0):
+        rows = [
+            {
+                "hydroponic_system": system,
+                "temperature": 21.0,
+                "ph": ph,
+                "tds": 500,
+                "timestamp": self.start + timedelta(minutes=start + index),
+            }
+            for index, ph in enumerate(values)
+        ]
+        response = self.client.post(reverse("reading-bulk"), rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_create_rule_validation(self):
+        url = reverse("alert rule-list")
+        response = self.client.post(url, {"hydroponic_system": 3, "metric": "ph"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            url,
+            {"hydroponic_system": 3, "metric": "ph", "min_value": 7, "max_value": 6},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Admin's system
+        response = self.client.post(
+            url, {"hydroponic_system": 2, "metric": "ph", "min_value": 5}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_range_alert_raised_and_resolved(self):
+        rule = self.create_rule(min_value=5.5, max_value=6.5)
+        self.send(6.0, 6.8, 6.9)
+        alert = Alert.objects.get()
+        self.assertEqual(alert.rule, rule)
+        self.assertEqual(alert.reason, "above")
+        self.assertEqual(alert.value, 6.8)
+        self.assertIsNone(alert.resolved_at)
+
+        self.send(6.2, start=3)
+        alert.refresh_from_db()
+        self.assertEqual(alert.resolved_at, self.start + timedelta(minutes=3))
+
+        response = self.client.get(reverse("alert-list"), {"open": True})
+        self.assertEqual(response.data["count"], 0)
+        response = self.client.get(reverse("alert-list"))
+        self.assertEqual(response.data["results"][0]["metric"], "ph")
+
+    def test_alert_raised_and_resolved_within_one_batch(self):
+        self.create_rule(max_value=6.5)
+        self.send(7.0, 6.0, 7.1)
+        alerts = list(Alert.objects.order_by("triggered_at"))
+        self.assertEqual(len(alerts), 2)
+        self.assertEqual(alerts[0].resolved_at, self.start + timedelta(minutes=1))
+        self.assertIsNone(alerts[1].resolved_at)
+
+    def test_sustained_violation(self):
+        self.create_rule(min_value=5.5, sustained_for="00:02:00")
+        self.send(5.0, 5.0, 6.0, 5.0, 5.0)
+        self.assertFalse(Alert.objects.exists())
+        self.send(5.0, start=5)
+        alert = Alert.objects.get()
+        self.assertEqual(alert.reason, "below")
+        self.assertEqual(alert.started_at, self.start + timedelta(minutes=3))
+        self.assertEqual(alert.triggered_at, self.start + timedelta(minutes=5))
+
+    def test_rate_of_change(self):
+        self.create_rule(max_rate=0.5)
+        self.send(6.0, 6.4, 7.4)
+        alert = Alert.objects.get()
+        self.assertEqual(alert.reason, "rate")
+        self.assertEqual(alert.value, 7.4)
+
+    def test_older_readings_are_ignored(self):
+        self.create_rule(max_value=6.5)
+        self.send(6.0, start=10)
+        self.send(7.0)
+        self.assertFalse(Alert.objects.exists())
+
+    def test_batch_without_transitions_needs_no_query(self):
+        self.create_rule(max_value=6.5)
+        self.create_rule(metric="tds", min_value=100)
+        self.send(6.0)
+        readings = [
+            Reading(
+                hydroponic_system_id=3,
+                temperature=21.0,
+                ph=6.0,
+                tds=500,
+                timestamp=self.start + timedelta(minutes=index),
+            )
+            for index in range(1, 101)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            write_readings(readings)
+        alert_table = Alert._meta.db_table
+        rule_table = AlertRule._meta.db_table
+        self.assertFalse(
+            [
+                query["sql"]
+                for query in queries
+                if alert_table in query["sql"] or rule_table in query["sql"]
+            ]
+        )
+
+    def test_changed_rule_is_recompiled(self):
+        rule = self.create_rule(max_value=6.5)
+        self.send(6.0)
+        response = self.client.patch(
+            reverse("alert rule-detail", args=[rule.pk]),
+            {"max_value": 5.5},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.send(6.0, start=1)
+        self.assertEqual(Alert.objects.get().reason, "above")
+
+    def test_open_alert_survives_lost_state(self):
+        self.create_rule(max_value=6.5)
+        self.send(7.0)
+        cache.clear()
+        self.send(7.2, start=1)
+        self.assertEqual(Alert.objects.count(), 1)
+        self.send(6.0, start=2)
+        self.assertIsNotNone(Alert.objects.get().resolved_at)
+
+    def test_alerts_are_scoped_to_owner(self):
+        admin_system = HydroponicSystem.objects.get(pk=2)
+        AlertRule.objects.create(
+            hydroponic_system=admin_system, metric="ph", max_value=6.5
+        )
+        write_readings(
+            [
+                Reading(
+                    hydroponic_system=admin_system,
+                    temperature=21.0,
+                    ph=7.0,
+                    tds=500,
+                    timestamp=self.start,
+                )
+            ]
+        )
+        self.assertEqual(Alert.objects.count(), 1)
+        response = self.client.get(reverse("alert-list"))
+        self.assertEqual(response.data["count"], 0)
+        response = self.client.get(reverse("alert rule-list"))
+        self.assertEqual(response.data["count"], 0)
+
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    # Query budgets of every systems and readings action. Each size has its
+    # own user with that many systems (one reading each), and that many
+    # readings on its first system.
+    @classmethod
+    def setUpTestData(cls):
+        start = make_aware(datetime(2025, 1, 1))
+        cls.users = {}
+        for size in BUDGET_SIZES:
+            user = User.objects.create_user(f"budget-{size}", password="budget")
+            token = Token.objects.create(user=user)
+            systems = HydroponicSystem.objects.bulk_create(
+                HydroponicSystem(owner=user, name=f"System {index}")
+                for index in range(size)
+            )
+            Reading.objects.bulk_create(
+                [
+                    Reading(
+                        hydroponic_system=system,
+                        temperature=21.0,
+                        ph=6.0,
+                        tds=500,
+                        timestamp=start,
+                    )
+                    for system in systems
+                ]
+                + [
+                    Reading(
+                        hydroponic_system=systems[0],
+                        temperature=21.0,
+                        ph=6.0,
+                        tds=500,
+                        timestamp=start + timedelta(minutes=index),
+                    )
+                    for index in range(1, size + 1)
+                ]
+            )
+            system_state.refresh(system.pk for system in systems)
+            reading = Reading.objects.filter(hydroponic_system=systems[0]).latest(
+                "timestamp"
+            )
+            cls.users[size] = (token.key, systems[0].pk, reading.pk)
+
+    def as_user(self, size):
+        token, system_id, reading_id = self.users[size]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        return system_id, reading_id
+
+    def reading(self, system_id, minute=0):
+        return {
+            "hydroponic_system": system_id,
+            "temperature": 22.0,
+            "ph": 6.2,
+            "tds": 510,
+            "timestamp": make_aware(datetime(2026, 1, 1)) + timedelta(minutes=minute),
+        }
+
+    def test_systems_list(self):
+        def send(size):
+            self.as_user(size)
+            return self.client.get(reverse("hydroponic system-list"))
+
+        self.assertQueryBudget("systems list", 4, send)
+
+    def test_systems_retrieve(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(
+                reverse("hydroponic system-detail", args=[system_id])
+            )
+
+        self.assertQueryBudget("systems retrieve", 3, send)
+
+    def test_systems_create(self):
+        def send(size):
+            self.as_user(size)
+            return self.client.post(
+                reverse("hydroponic system-list"),
+                {"name": "New", "description": "Budget"},
+            )
+
+        self.assertQueryBudget("systems create", 3, send)
+
+    def test_systems_update(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.put(
+                reverse("hydroponic system-detail", args=[system_id]),
+                {"name": "Renamed", "description": "Updated"},
+            )
+
+        self.assertQueryBudget("systems update", 4, send)
+
+    def test_systems_partial_update(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.patch(
+                reverse("hydroponic system-detail", args=[system_id]),
+                {"name": "Renamed"},
+            )
+
+        self.assertQueryBudget("systems partial update", 4, send)
+
+    def test_systems_destroy(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.delete(
+                reverse("hydroponic system-detail", args=[system_id])
+            )
+
+        self.assertQueryBudget("systems destroy", 9, send)
+
+    def test_systems_state(self):
+        def send(size):
+            self.as_user(size)
+            return self.client.get(reverse("hydroponic system-state"))
+
+        self.assertQueryBudget("systems state", 3, send)
+
+    def test_systems_aggregate(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(
+                reverse("hydroponic system-aggregate", args=[system_id]),
+                {"bucket": "1h"},
+            )
+
+        self.assertQueryBudget("systems aggregate", 4, send)
+
+    def test_systems_analytics(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(
+                reverse("hydroponic system-analytics", args=[system_id])
+            )
+
+        self.assertQueryBudget("systems analytics", 3, send)
+
+    def test_readings_list(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(
+                reverse("reading-list"), {"hydroponic_system": system_id}
+            )
+
+        self.assertQueryBudget("readings list", 2, send)
+
+    def test_readings_retrieve(self):
+        def send(size):
+            _, reading_id = self.as_user(size)
+            return self.client.get(reverse("reading-detail", args=[reading_id]))
+
+        self.assertQueryBudget("readings retrieve", 2, send)
+
+    def test_readings_create(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.post(
+                reverse("reading-list"), self.reading(system_id), format="json"
+            )
+
+        self.assertQueryBudget("readings create", 5, send)
+
+    def test_readings_update(self):
+        def send(size):
+            system_id, reading_id = self.as_user(size)
+            return self.client.put(
+                reverse("reading-detail", args=[reading_id]),
+                self.reading(system_id),
+                format="json",
+            )
+
+        # Includes the check that the moved reading doesn't collide
+        self.assertQueryBudget("readings update", 7, send)
+
+    def test_readings_partial_update(self):
+        def send(size):
+            _, reading_id = self.as_user(size)
+            return self.client.patch(
+                reverse("reading-detail", args=[reading_id]),
+                {"ph": 6.4},
+                format="json",
+            )
+
+        self.assertQueryBudget("readings partial update", 6, send)
+
+    def test_readings_destroy(self):
+        def send(size):
+            _, reading_id = self.as_user(size)
+            return self.client.delete(reverse("reading-detail", args=[reading_id]))
+
+        self.assertQueryBudget("readings destroy", 5, send)
+
+    def test_readings_bulk(self):
+        # The batch grows with the size as well
+        def send(size):
+            system_id, _ = self.as_user(size)
+            rows = [self.reading(system_id, minute) for minute in range(size)]
+            return self.client.post(reverse("reading-bulk"), rows, format="json")
+
+        self.assertQueryBudget("readings bulk", 5, send)
+
+    def test_readings_export(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(
+                reverse("reading-export"),
+                {"hydroponic_system": system_id, "format": "csv"},
+            )
+
+        self.assertQueryBudget("readings export", 3, send)
+
+    def test_async_systems_list(self):
+        def send(size):
+            self.as_user(size)
+            return self.client.get(reverse("async-system-list"))
+
+        self.assertQueryBudget("async systems list", 4, send)
+
+    def test_async_systems_retrieve(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(reverse("async-system-detail", args=[system_id]))
+
+        self.assertQueryBudget("async systems retrieve", 3, send)
+
+    def test_async_readings_list(self):
+        def send(size):
+            system_id, _ = self.as_user(size)
+            return self.client.get(
+                reverse("async-reading-list"), {"hydroponic_system": system_id}
+            )
+
+        self.assertQueryBudget("async readings list", 2, send)
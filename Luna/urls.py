@@ -1,11 +1,33 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import HydroponicSystemViewSet, ReadingViewSet
+from .views import (
+    AlertRuleViewSet,
+    AlertViewSet,
+    HydroponicSystemViewSet,
+    ReadingStreamTicketView,
+    ReadingViewSet,
+    async_reading_list,
+    async_system_detail,
+    async_system_list,
+    reading_stream,
+)
 
 router = DefaultRouter()
 router.register(r"systems", HydroponicSystemViewSet, basename="hydroponic system")
 router.register(r"readings", ReadingViewSet, basename="reading")
+router.register(r"alert-rules", AlertRuleViewSet, basename="alert rule")
+router.register(r"alerts", AlertViewSet, basename="alert")
 
 urlpatterns = [
+    # Ahead of the router, which would take "stream" for a reading id
+    path("readings/stream/", reading_stream, name="reading-stream"),
+    path(
+        "readings/stream/ticket/",
+        ReadingStreamTicketView.as_view(),
+        name="reading-stream-ticket",
+    ),
+    path("async/systems/", async_system_list, name="async-system-list"),
+    path("async/systems/<int:pk>/", async_system_detail, name="async-system-detail"),
+    path("async/readings/", async_reading_list, name="async-reading-list"),
     path("", include(router.urls)),
 ]
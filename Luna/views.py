@@ -1,70 +1,643 @@
-from django.db.models import Prefetch
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django_filters import rest_framework as filters
+from django_filters.utils import translate_validation
 from rest_framework import filters as drf_filters
-from rest_framework import viewsets, permissions
+from rest_framework import status, viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    ValidationError,
+)
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+
+from api_auth.authentication import CachingTokenAuthentication
+from main import replicas
+from main.replicas import ReplicaReadMixin
 
-from .models import HydroponicSystem, Reading
+from . import (
+    analytics,
+    latest_readings,
+    live,
+    pipeline,
+    response_cache,
+    rollups,
+)
+from .aggregation import aggregate_readings, aggregate_rollups, merge_buckets
+from .ingest import (
+    CREATED,
+    DUPLICATE,
+    QUEUED,
+    ingest_readings,
+    validate_readings,
+    write_readings,
+)
+from .models import Alert, AlertRule, HydroponicSystem, Reading, SystemState
+from .pagination import KeysetCursorPagination
+from .parsers import NDJSONParser, ReadingRecordsParser, is_reading_records
+from .renderers import EXPORT_RENDERERS, ReadingRecordsRenderer
 from .seliarizers import (
+    AlertRuleSerializer,
+    AlertSerializer,
     HydroponicSystemSerializer,
     ReadingSerializer,
     HydroponicSystemDetailSerializer,
+    ReadingAggregateQuerySerializer,
+    ReadingAnalyticsQuerySerializer,
+    ReadingValuesSerializer,
+    SystemStateSerializer,
 )
+from .signals import readings_changed
 
 
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        # owner_id, so the owner's row is never loaded for the check
+        return obj.owner_id == request.user.pk
 
 
-class HydroponicSystemViewSet(viewsets.ModelViewSet):
+class HydroponicSystemViewSet(
+    ReplicaReadMixin, response_cache.CachedResponseMixin, viewsets.ModelViewSet
+):
     serializer_class = HydroponicSystemSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return HydroponicSystemDetailSerializer
+        if self.action == "state":
+            return SystemStateSerializer
         return HydroponicSystemSerializer
 
     def get_queryset(self):
-        queryset = HydroponicSystem.objects.filter(owner=self.request.user)
-
-        # Eager loading dla wydajności
-        if self.action == "retrieve":
-            queryset = queryset.prefetch_related(
-                Prefetch(
-                    "readings",
-                    queryset=Reading.objects.order_by("-timestamp")[:10],
-                    to_attr="latest_readings",
-                )
-            )
-        return queryset
+        # Latest readings come from the per-system cache in Luna.latest_readings,
+        # the owner is serialized by username
+        return HydroponicSystem.objects.filter(owner=self.request.user).select_related(
+            "owner"
+        )
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    @action(detail=False, methods=["get"])
+    def state(self, request):
+        queryset = (
+            SystemState.objects.filter(hydroponic_system__owner=request.user)
+            .select_related("hydroponic_system")
+            .order_by("hydroponic_system")
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=True, methods=["get"], url_path="readings/aggregate")
+    def aggregate(self, request, pk=None):
+        system = self.get_object()
+        query = ReadingAggregateQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        filterset = ReadingFilter(
+            request.query_params, queryset=system.readings.all(), request=request
+        )
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+
+        bucket = query.validated_data["bucket"]
+        aggregates = query.validated_data["agg"]
+        limit = settings.READINGS_AGGREGATE_MAX_BUCKETS
+        results = aggregate_readings(filterset.qs, bucket, aggregates, limit=limit + 1)
+
+        # Readings past retention only survive in the rollups. Those cannot be
+        # filtered by value and only serve buckets of whole hours or days.
+        rollup = rollups.rollup_for(bucket)
+        params = filterset.form.cleaned_data
+        if rollup is not None and not any(
+            value is not None
+            for name, value in params.items()
+            if name not in ("timestamp_after", "timestamp_before")
+        ):
+            queryset = rollup.objects.filter(hydroponic_system=system)
+            if params["timestamp_after"] is not None:
+                queryset = queryset.filter(bucket__gte=params["timestamp_after"])
+            if params["timestamp_before"] is not None:
+                queryset = queryset.filter(bucket__lte=params["timestamp_before"])
+            results = merge_buckets(
+                results,
+                aggregate_rollups(queryset, bucket, aggregates, limit=limit + 1),
+            )
+        if len(results) > limit:
+            raise ValidationError(
+                {
+                    "bucket": [
+                        f"Result exceeds {limit} buckets, use a larger bucket "
+                        "or a narrower time range."
+                    ]
+                }
+            )
+        return Response(
+            {"bucket_seconds": int(bucket.total_seconds()), "results": results}
+        )
+
+    # Statistics computed with NumPy over the whole time range, see
+    # Luna.analytics
+    @action(detail=True, methods=["get"], url_path="readings/analytics")
+    def analytics(self, request, pk=None):
+        system = self.get_object()
+        query = ReadingAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        return Response(
+            analytics.analyze(
+                system,
+                params["window"],
+                params["points"],
+                start=params["timestamp_after"],
+                end=params["timestamp_before"],
+            )
+        )
+
 
 class ReadingFilter(filters.FilterSet):
+    # A plain number: readings are scoped to the user's systems already, so
+    # other systems match nothing and need no lookup to be rejected
+    hydroponic_system = filters.NumberFilter()
     timestamp_after = filters.DateTimeFilter(field_name="timestamp", lookup_expr="gte")
     timestamp_before = filters.DateTimeFilter(field_name="timestamp", lookup_expr="lte")
 
     class Meta:
         model = Reading
         fields = {
-            "hydroponic_system": ["exact"],
             "temperature": ["exact", "gte", "lte"],
             "ph": ["exact", "gte", "lte"],
             "tds": ["exact", "gte", "lte"],
         }
 
 
-class ReadingViewSet(viewsets.ModelViewSet):
+EXPORT_COLUMNS = ["id", "hydroponic_system", "temperature", "ph", "tds", "timestamp"]
+EXPORT_FIELDS = ["id", "hydroponic_system_id", "temperature", "ph", "tds", "timestamp"]
+
+
+class ReadingViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = ReadingSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.DjangoFilterBackend, drf_filters.OrderingFilter]
     filterset_class = ReadingFilter
     ordering_fields = ["timestamp", "temperature", "ph", "tds"]
+    ordering = ["-timestamp"]
+    pagination_class = KeysetCursorPagination
+    # Besides JSON, readings are sent and fetched as binary records, see
+    # Luna.parsers.READING_RECORD
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + [ReadingRecordsParser]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [ReadingRecordsRenderer]
 
     def get_queryset(self):
         return Reading.objects.filter(
             hydroponic_system__owner=self.request.user
         ).order_by("-timestamp")
+
+    # A binary body is a list of records, create and update take exactly one
+    def get_serializer(self, *args, **kwargs):
+        if "data" in kwargs and is_reading_records(self.request):
+            if len(kwargs["data"]) != 1:
+                raise ValidationError(
+                    {"non_field_errors": ["Expected exactly one reading."]}
+                )
+            kwargs["data"] = kwargs["data"][0]
+        return super().get_serializer(*args, **kwargs)
+
+    # Reads skip ReadingSerializer and model instances altogether, see
+    # ReadingValuesSerializer. Binary records are packed from the rows as is.
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *ReadingValuesSerializer.fields
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self._serialize_rows(page))
+        return Response(self._serialize_rows(queryset))
+
+    def _serialize_rows(self, rows):
+        if isinstance(self.request.accepted_renderer, ReadingRecordsRenderer):
+            return list(rows)
+        return ReadingValuesSerializer(rows, many=True).data
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *ReadingValuesSerializer.fields
+        )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset, **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return Response(ReadingValuesSerializer(row).data)
+
+    # Resending a reading is harmless: the stored one is returned with 200. With
+    # READINGS_ASYNC_INGEST, writes are validated here and left to the
+    # background writer in Luna.pipeline; the response carries no id yet.
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reading = Reading(**serializer.validated_data)
+        if settings.READINGS_ASYNC_INGEST:
+            pipeline.writer.submit([reading])
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        if write_readings([reading]):
+            response_status = status.HTTP_201_CREATED
+        else:
+            reading = Reading.objects.get(
+                hydroponic_system=reading.hydroponic_system, timestamp=reading.timestamp
+            )
+            response_status = status.HTTP_200_OK
+        return Response(self.get_serializer(reading).data, status=response_status)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        readings_changed([instance.hydroponic_system_id], {self.request.user.pk})
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk",
+        parser_classes=[JSONParser, NDJSONParser, ReadingRecordsParser],
+        renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES,
+    )
+    def bulk(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError(
+                {"non_field_errors": ["Expected a list of readings."]}
+            )
+        if len(rows) > settings.READINGS_BULK_MAX_ROWS:
+            raise ValidationError(
+                {
+                    "non_field_errors": [
+                        f"Ensure there are at most {settings.READINGS_BULK_MAX_ROWS} "
+                        "readings per request."
+                    ]
+                }
+            )
+
+        if settings.READINGS_ASYNC_INGEST:
+            return self._enqueue(rows)
+
+        results = ingest_readings(rows, owner=request.user)
+        created = sum(1 for result in results if result["status"] == CREATED)
+        duplicates = sum(1 for result in results if result["status"] == DUPLICATE)
+        failed = len(results) - created - duplicates
+        if not failed:
+            response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        elif failed < len(results):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {
+                "created": created,
+                "duplicates": duplicates,
+                "failed": failed,
+                "results": results,
+            },
+            status=response_status,
+        )
+
+    def _enqueue(self, rows):
+        results, readings = validate_readings(rows, owner=self.request.user)
+        if readings:
+            pipeline.writer.submit([reading for _, reading in readings])
+        for index, _ in readings:
+            results[index] = {"index": index, "status": QUEUED}
+
+        queued = len(readings)
+        if queued == len(results):
+            response_status = status.HTTP_202_ACCEPTED
+        elif queued:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {"queued": queued, "failed": len(results) - queued, "results": results},
+            status=response_status,
+        )
+
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        # A server-side cursor keeps memory flat however many rows match. Rows
+        # stream after the view returns, so the database is bound here.
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = (
+            queryset.using(queryset.db)
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=settings.READINGS_EXPORT_CHUNK_SIZE)
+        )
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+
+        response = StreamingHttpResponse(
+            renderer.stream(EXPORT_COLUMNS, rows), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="readings.{renderer.format}"'
+        )
+        return response
+
+
+async def _event_stream(subscription):
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                data = await asyncio.wait_for(
+                    subscription.queue.get(), settings.READINGS_STREAM_KEEPALIVE
+                )
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if data is None:
+                return
+            yield f"event: readings\ndata: {data}\n\n"
+    finally:
+        live.broadcaster.unsubscribe(subscription)
+
+
+def _unauthorized(detail):
+    response = JsonResponse({"detail": detail}, status=status.HTTP_401_UNAUTHORIZED)
+    response["WWW-Authenticate"] = "Token"
+    return response
+
+
+# The user of the request's token from the Authorization header. Raises
+# NotAuthenticated or AuthenticationFailed.
+async def _authenticate(request):
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != "token":
+        raise NotAuthenticated()
+    user, _ = await CachingTokenAuthentication().aauthenticate_credentials(header[1])
+    return user
+
+
+# The user of a ``?ticket=`` from ReadingStreamTicketView, the session or the
+# token, in that order
+async def _authenticate_stream(request):
+    ticket = request.GET.get("ticket")
+    if ticket is not None:
+        try:
+            user_id = live.ticket_user_id(ticket)
+        except signing.BadSignature:
+            raise AuthenticationFailed("Invalid or expired ticket.")
+        user = (
+            await get_user_model().objects.filter(pk=user_id, is_active=True).afirst()
+        )
+        if user is None:
+            raise AuthenticationFailed("Invalid or expired ticket.")
+        return user
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    return await _authenticate(request)
+
+
+class ReadingStreamTicketView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response(
+            {
+                "ticket": live.issue_ticket(request.user.pk),
+                "expires_in": settings.READINGS_STREAM_TICKET_MAX_AGE,
+            }
+        )
+
+
+# Server-sent events with the readings written for the user's systems, or the
+# ones given as ``hydroponic_system``. EventSource cannot send headers, so it
+# authenticates with the session cookie or a short-lived ``?ticket=`` from
+# ReadingStreamTicketView, never the API token in the URL. Only served by
+# the ASGI server: under WSGI the response is consumed by a sync worker that
+# never sees the events of the event loop, so the stream would stay silent.
+async def reading_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "Streams need SERVER_INTERFACE=asgi."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    try:
+        user = await _authenticate_stream(request)
+    except (NotAuthenticated, AuthenticationFailed) as exc:
+        return _unauthorized(exc.detail)
+
+    system_ids = None
+    if "hydroponic_system" in request.GET:
+        try:
+            system_ids = {int(pk) for pk in request.GET.getlist("hydroponic_system")}
+        except ValueError:
+            system_ids = set()
+        owned = await HydroponicSystem.objects.filter(
+            owner=user, pk__in=system_ids
+        ).acount()
+        if not system_ids or owned != len(system_ids):
+            return JsonResponse(
+                {"hydroponic_system": ["Unknown hydroponic system."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    if settings.READINGS_STREAM_BACKEND == "postgres":
+        live.listener.start()
+    subscription = live.broadcaster.subscribe(user.pk, system_ids)
+    response = StreamingHttpResponse(
+        _event_stream(subscription), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Keeps proxies such as nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# Async reads of the systems list and detail and the readings list, with the
+# same JSON as the viewsets. Under ASGI a request waiting for the database or
+# the client holds no worker thread, and cached or not modified responses and
+# cached tokens are answered without leaving the event loop. Token
+# authentication only.
+def async_read_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return JsonResponse(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                headers={"Allow": "GET, HEAD"},
+            )
+        try:
+            user = await _authenticate(request)
+            with replicas.reading_from(await replicas.aread_alias(user.pk)):
+                return await view(request, user, *args, **kwargs)
+        except (NotAuthenticated, AuthenticationFailed) as exc:
+            return _unauthorized(exc.detail)
+        except APIException as exc:
+            return HttpResponse(
+                JSONRenderer().render(
+                    exc.detail
+                    if isinstance(exc.detail, (list, dict))
+                    else {"detail": exc.detail}
+                ),
+                content_type="application/json",
+                status=exc.status_code,
+            )
+
+    return wrapper
+
+
+# The DRF request and viewset the async views borrow filtering, ordering and
+# pagination from
+def _viewset(viewset_class, request, user, action):
+    drf_request = Request(request)
+    drf_request.user = user
+    view = viewset_class(
+        request=drf_request, args=(), kwargs={}, format_kwarg=None, action=action
+    )
+    return drf_request, view
+
+
+# Slice and links of the requested page, the way PageNumberPagination does it
+# with a synchronous count
+def _page(paginator, request, count):
+    size = paginator.get_page_size(request)
+    pages = max(1, -(-count // size))
+    number = request.query_params.get(paginator.page_query_param) or 1
+    if number in paginator.last_page_strings:
+        number = pages
+    try:
+        number = int(number)
+    except ValueError:
+        number = 0
+    if not 1 <= number <= pages:
+        raise NotFound(
+            paginator.invalid_page_message.format(page_number=number, message="")
+        )
+
+    url = request.build_absolute_uri()
+    param = paginator.page_query_param
+    links = {"next": None, "previous": None}
+    if number < pages:
+        links["next"] = replace_query_param(url, param, number + 1)
+    if number == 2:
+        links["previous"] = remove_query_param(url, param)
+    elif number > 2:
+        links["previous"] = replace_query_param(url, param, number - 1)
+    return (number - 1) * size, number * size, links
+
+
+def _systems(user):
+    return HydroponicSystem.objects.filter(owner=user).select_related("owner")
+
+
+@async_read_view
+async def async_system_list(request, user):
+    async def handler():
+        drf_request, view = _viewset(HydroponicSystemViewSet, request, user, "list")
+        count = await _systems(user).acount()
+        offset, limit, links = _page(view.paginator, drf_request, count)
+        systems = [
+            system async for system in _systems(user).order_by("pk")[offset:limit]
+        ]
+        readings = await sync_to_async(latest_readings.get_many)(
+            system.pk for system in systems
+        )
+        return {
+            "count": count,
+            **links,
+            "results": HydroponicSystemSerializer(
+                systems,
+                many=True,
+                context={"request": drf_request, "latest_readings": readings},
+            ).data,
+        }
+
+    return await response_cache.acached_response(request, user, "list", handler)
+
+
+@async_read_view
+async def async_system_detail(request, user, pk):
+    async def handler():
+        system = await _systems(user).filter(pk=pk).afirst()
+        if system is None:
+            raise NotFound("No HydroponicSystem matches the given query.")
+        readings = await sync_to_async(latest_readings.get_many)([system.pk])
+        return HydroponicSystemDetailSerializer(
+            system, context={"latest_readings": readings}
+        ).data
+
+    return await response_cache.acached_response(request, user, "retrieve", handler)
+
+
+@async_read_view
+async def async_reading_list(request, user):
+    drf_request, view = _viewset(ReadingViewSet, request, user, "list")
+    queryset = view.filter_queryset(view.get_queryset()).values(
+        *ReadingValuesSerializer.fields
+    )
+    paginator = view.paginator
+    page = paginator.prepare_queryset(queryset, drf_request, view)
+    if page is None:
+        rows = [row async for row in queryset.aiterator()]
+        data = ReadingValuesSerializer(rows, many=True).data
+    else:
+        rows = paginator.paginate_rows([row async for row in page])
+        data = paginator.get_paginated_response(
+            ReadingValuesSerializer(rows, many=True).data
+        ).data
+    return HttpResponse(JSONRenderer().render(data), content_type="application/json")
+
+
+class AlertRuleViewSet(viewsets.ModelViewSet):
+    serializer_class = AlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ["hydroponic_system", "metric", "is_active"]
+
+    def get_queryset(self):
+        return AlertRule.objects.filter(
+            hydroponic_system__owner=self.request.user
+        ).order_by("pk")
+
+
+class AlertFilter(filters.FilterSet):
+    open = filters.BooleanFilter(field_name="resolved_at", lookup_expr="isnull")
+
+    class Meta:
+        model = Alert
+        fields = ["hydroponic_system", "rule", "reason"]
+
+
+# Alerts are raised and resolved by Luna.alerts as readings are written
+class AlertViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = AlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_class = AlertFilter
+
+    def get_queryset(self):
+        return (
+            Alert.objects.filter(hydroponic_system__owner=self.request.user)
+            .select_related("rule")
+            .order_by("-triggered_at", "-pk")
+        )
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+# Version tokens in the shared cache, replaced when a token is deleted or its
+# user changes. Every process checks them on each hit of its local cache, so
+# an invalidation in one worker applies to all of them at once. Like
+# Luna.response_cache, a missing version counts as changed, so an evicted or
+# flushed one cannot bring back an invalidated entry.
+def token_version_key(key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"luna:token-version:{digest}"
+
+
+def user_version_key(user_id):
+    return f"luna:token-user-version:{user_id}"
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return tuple(versions[key] for key in keys)
+
+
+def bump(keys):
+    cache.set_many({key: uuid4().hex for key in keys}, None)
+
+
+def _fields(instance):
+    return tuple(
+        (field.attname, getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+    )
+
+
+def _instance(model, fields):
+    return model.from_db(None, [name for name, _ in fields], [v for _, v in fields])
+
+
+class TokenCache:
+    # Bounded LRU of token key -> field values of the user and token, with a
+    # TTL per entry. Every hit builds a fresh (user, token) pair, so requests
+    # never share a mutable User, and is checked against the shared versions.
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def _checked(self, key, entry, current):
+        _, version_keys, versions, user, token = entry
+        if tuple(current.get(version_key) for version_key in version_keys) != versions:
+            with self.lock:
+                if self.entries.get(key) is entry:
+                    del self.entries[key]
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        user = _instance(user[0], user[1])
+        token = _instance(token[0], token[1])
+        token.user = user
+        return user, token
+
+    def get(self, key):
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        return self._checked(key, entry, cache.get_many(entry[1]))
+
+    async def aget(self, key):
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        return self._checked(key, entry, await cache.aget_many(entry[1]))
+
+    def set(self, key, credentials):
+        user, token = credentials
+        version_keys = [token_version_key(key), user_version_key(user.pk)]
+        # Read before the caller's credentials can go stale: a later bump
+        # always leaves the entry behind
+        versions = _versions(version_keys)
+        entry = (
+            time.monotonic() + self.ttl,
+            version_keys,
+            versions,
+            (type(user), _fields(user)),
+            (type(token), _fields(token)),
+        )
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        bump([token_version_key(key)])
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        bump([user_version_key(user_id)])
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                if entry[1][1] == user_version_key(user_id):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+token_cache = TokenCache(settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL)
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication without the Token + User query on every request.
+    # Entries are invalidated in every process when the token is deleted or
+    # its user is saved, see api_auth.signals.
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = self._load(key)
+        return credentials
+
+    def _load(self, key):
+        credentials = super().authenticate_credentials(key)
+        token_cache.set(key, credentials)
+        return credentials
+
+    # For async views: cached tokens are resolved without a thread
+    async def aauthenticate_credentials(self, key):
+        credentials = await token_cache.aget(key)
+        if credentials is None:
+            credentials = await sync_to_async(self._load)(key)
+        return credentials
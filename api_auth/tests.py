@@ -2,8 +2,13 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
 from rest_framework.authtoken.models import Token
 
+from main.testing import QueryBudgetMixin
+
+from .authentication import TokenCache, token_cache
+
 User = get_user_model()
 
 
@@ -73,3 +78,126 @@ class TestAuthToken(APITestCase):
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("non_field_errors", response.data)
+
+
+class TestCachingTokenAuthentication(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        django_cache.clear()
+        self.url = reverse("token-cache")
+        self.user = User.objects.create_user(
+            username="staff", password="validpass123", is_staff=True
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_repeated_requests_skip_token_query(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["hits"], 1)
+        self.assertEqual(response.data["misses"], 1)
+        self.assertEqual(response.data["hit_rate"], 0.5)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_require_staff(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cache_is_bounded(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        for key in ["a", "b", "c"]:
+            cache.set(key, (self.user, self.token))
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_entries_expire(self):
+        cache = TokenCache(maxsize=2, ttl=0)
+        cache.set("a", (self.user, self.token))
+        self.assertIsNone(cache.get("a"))
+
+    def test_hits_are_fresh_instances(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set(self.token.key, (self.user, self.token))
+        user, token = cache.get(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+        self.assertIs(token.user, user)
+        self.assertIsNot(user, cache.get(self.token.key)[0])
+
+    def test_invalidation_reaches_other_processes(self):
+        # Another worker's cache, invalidated through the shared versions only
+        other = TokenCache(maxsize=10, ttl=60)
+        other.set(self.token.key, (self.user, self.token))
+        self.assertIsNotNone(other.get(self.token.key))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(other.get(self.token.key))
+
+        other.set(self.token.key, (self.user, self.token))
+        self.token.delete()
+        self.assertIsNone(other.get(self.token.key))
+
+        # An evicted version counts as changed
+        other.set("b", (self.user, self.token))
+        django_cache.clear()
+        self.assertIsNone(other.get("b"))
+
+
+class TestQueryBudgets(QueryBudgetMixin, APITestCase):
+    # Sizes are the number of other registered users
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="budgetuser", password="budgetpass123", is_staff=True
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def add_users(self, size):
+        existing = User.objects.filter(username__startswith="other-").count()
+        User.objects.bulk_create(
+            User(username=f"other-{index}") for index in range(existing, size)
+        )
+
+    def test_register(self):
+        def send(size):
+            return self.client.post(
+                reverse("register"),
+                {
+                    "username": f"new-{size}",
+                    "password": "newpass123",
+                    "email": "new@example.com",
+                },
+            )
+
+        self.assertQueryBudget("register", 2, send, prepare=self.add_users)
+
+    def test_token(self):
+        def send(size):
+            return self.client.post(
+                reverse("token"),
+                {"username": "budgetuser", "password": "budgetpass123"},
+            )
+
+        self.assertQueryBudget("token", 2, send, prepare=self.add_users)
+
+    def test_token_cache_stats(self):
+        def send(size):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+            return self.client.get(reverse("token-cache"))
+
+        self.assertQueryBudget("token cache stats", 1, send, prepare=self.add_users)
@@ -0,0 +1,129 @@
+"""
+Fill the configured database with benchmark data: N users with an API token,
+M systems per user and K readings per system, one minute apart and ending now.
+
+Users are named bench-<n> and share the password "bench". Readings are loaded
+with COPY, so millions of rows take seconds:
+
+    python benchmarks/generate_data.py --users 10 --systems 10 --readings 10000
+
+Run it against a local PostgreSQL, never production. --reset removes the
+previous benchmark users with all their systems and readings first.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from Luna import system_state  # noqa: E402
+from Luna.models import HydroponicSystem, Reading  # noqa: E402
+
+USERNAME_PREFIX = "bench-"
+PASSWORD = "bench"
+COPY_SQL = (
+    f"COPY {connection.ops.quote_name(Reading._meta.db_table)} "
+    '(hydroponic_system_id, temperature, ph, tds, "timestamp") '
+    "FROM STDIN (FORMAT BINARY)"
+)
+TYPES = ("bigint", "float8", "float8", "float8", "timestamptz")
+
+
+def benchmark_users():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+def reset():
+    count = benchmark_users().count()
+    benchmark_users().delete()
+    cache.clear()
+    return count
+
+
+def create_users(count):
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        User(username=f"{USERNAME_PREFIX}{index}", password=password)
+        for index in range(count)
+    )
+    Token.objects.bulk_create(
+        Token(key=Token.generate_key(), user=user) for user in users
+    )
+    return users
+
+
+def create_systems(users, count):
+    return HydroponicSystem.objects.bulk_create(
+        HydroponicSystem(owner=user, name=f"{user.username} system {index}")
+        for user in users
+        for index in range(count)
+    )
+
+
+def copy_readings(systems, count, seed):
+    rng = random.Random(seed)
+    end = timezone.now().replace(second=0, microsecond=0)
+    minute = timedelta(minutes=1)
+    with connection.cursor() as cursor, cursor.copy(COPY_SQL) as copy:
+        copy.set_types(TYPES)
+        for system in systems:
+            temperature, ph, tds = 21.0, 6.0, 800.0
+            for index in range(count):
+                # Random walks, so aggregates and filters see realistic spread
+                temperature += rng.uniform(-0.1, 0.1)
+                ph += rng.uniform(-0.02, 0.02)
+                tds += rng.uniform(-5, 5)
+                copy.write_row(
+                    (system.pk, temperature, ph, tds, end - (count - index) * minute)
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--systems", type=int, default=10, help="Per user.")
+    parser.add_argument("--readings", type=int, default=1000, help="Per system.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true")
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        parser.error("The benchmark data is loaded with COPY and needs PostgreSQL.")
+    if args.reset:
+        print(f"Removed {reset()} benchmark users")
+    elif benchmark_users().exists():
+        parser.error("Benchmark users exist already, pass --reset to replace them.")
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        users = create_users(args.users)
+        systems = create_systems(users, args.systems)
+        copy_readings(systems, args.readings, args.seed)
+        system_state.refresh(system.pk for system in systems)
+    rows = len(systems) * args.readings
+    seconds = time.perf_counter() - start
+    print(
+        f"Created {len(users)} users, {len(systems)} systems and {rows} readings "
+        f"in {seconds:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Load test the API in-process against the configured database, which should
+be a local PostgreSQL filled by generate_data.py.
+
+Every scenario sends --requests requests from --concurrency threads through
+the full middleware stack, as benchmark users, and reports latency
+percentiles, requests per second and SQL queries per request:
+
+    python benchmarks/load_test.py --save baseline.json
+    python benchmarks/load_test.py --baseline baseline.json --tolerance 0.2
+
+With --baseline the run exits with status 1 when a scenario got slower (p95),
+lost throughput beyond the tolerance or runs more queries per request.
+Ingest scenarios write readings, keep the data set for benchmarks only.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from Luna.models import HydroponicSystem  # noqa: E402
+from main import metrics  # noqa: E402
+
+USERNAME_PREFIX = "bench-"
+# Cache misses make queries per request vary a little between runs
+QUERY_SLACK = 0.05
+
+
+class Workload:
+    # Benchmark users with their token and systems, and unique timestamps for
+    # the ingest scenarios, past anything generate_data.py wrote
+    def __init__(self, seed):
+        self.users = []
+        for token in Token.objects.filter(
+            user__username__startswith=USERNAME_PREFIX
+        ).order_by("user_id"):
+            system_ids = list(
+                HydroponicSystem.objects.filter(owner_id=token.user_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            if system_ids:
+                self.users.append((token.key, system_ids))
+        self.now = timezone.now()
+        self.seconds = itertools.count(1)
+        self.lock = threading.Lock()
+        self.seed = seed
+
+    def timestamps(self, count):
+        with self.lock:
+            return [
+                (self.now + timedelta(seconds=next(self.seconds))).isoformat()
+                for _ in range(count)
+            ]
+
+
+def _reading(system_id, timestamp):
+    return {
+        "hydroponic_system": system_id,
+        "temperature": 21.5,
+        "ph": 6.1,
+        "tds": 810,
+        "timestamp": timestamp,
+    }
+
+
+def ingest(workload, system_id):
+    (timestamp,) = workload.timestamps(1)
+    return "post", "/api/readings/", _reading(system_id, timestamp)
+
+
+def bulk_ingest(workload, system_id):
+    rows = [_reading(system_id, ts) for ts in workload.timestamps(100)]
+    return "post", "/api/readings/bulk/", rows
+
+
+def systems(workload, system_id):
+    return "get", "/api/systems/", None
+
+
+def detail(workload, system_id):
+    return "get", f"/api/systems/{system_id}/", None
+
+
+def filtered_list(workload, system_id):
+    after = (workload.now - timedelta(days=1)).isoformat()
+    return (
+        "get",
+        "/api/readings/",
+        {"hydroponic_system": system_id, "timestamp_after": after, "ph__gte": 5},
+    )
+
+
+def ordering(workload, system_id):
+    return (
+        "get",
+        "/api/readings/",
+        {"hydroponic_system": system_id, "ordering": "-ph"},
+    )
+
+
+def aggregate(workload, system_id):
+    after = (workload.now - timedelta(days=7)).isoformat()
+    return (
+        "get",
+        f"/api/systems/{system_id}/readings/aggregate/",
+        {"bucket": "1h", "timestamp_after": after},
+    )
+
+
+SCENARIOS = {
+    "ingest": ingest,
+    "bulk_ingest": bulk_ingest,
+    "systems": systems,
+    "detail": detail,
+    "list": filtered_list,
+    "ordering": ordering,
+    "aggregate": aggregate,
+}
+
+
+def _run(plan, concurrency, send):
+    # Every thread has its own client and database connection
+    pending = iter(plan)
+    lock = threading.Lock()
+    latencies, failures = [], []
+
+    def worker():
+        client = Client()
+        try:
+            while not failures:
+                with lock:
+                    item = next(pending, None)
+                if item is None:
+                    return
+                latencies.append(send(client, *item))
+        except Exception as error:
+            failures.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    return latencies, time.perf_counter() - start
+
+
+def run_scenario(workload, scenario, requests, concurrency, warmup):
+    build = SCENARIOS[scenario]
+    rng = random.Random(workload.seed)
+    plan = []
+    for _ in range(warmup + requests):
+        token, system_ids = rng.choice(workload.users)
+        plan.append((token, *build(workload, rng.choice(system_ids))))
+    errors = []
+
+    def send(client, token, method, path, data):
+        start = time.perf_counter()
+        if method == "get":
+            response = client.get(path, data, HTTP_AUTHORIZATION=f"Token {token}")
+        else:
+            response = client.post(
+                path,
+                json.dumps(data),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Token {token}",
+            )
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+        return elapsed
+
+    _run(plan[:warmup], concurrency, send)
+    errors.clear()
+    metrics.registry.clear()
+    latencies, wall = _run(plan[warmup:], concurrency, send)
+
+    with metrics.registry.lock:
+        histograms = list(metrics.registry.queries.values())
+    counted = sum(histogram.count for histogram in histograms)
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "rps": requests / wall,
+        "p50": percentiles[49] * 1000,
+        "p95": percentiles[94] * 1000,
+        "p99": percentiles[98] * 1000,
+        "queries": (
+            sum(histogram.sum for histogram in histograms) / counted
+            if counted
+            else None
+        ),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if base is None:
+            continue
+        if result["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: p95 {base['p95']:.1f}ms -> {result['p95']:.1f}ms"
+            )
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario}: {base['rps']:.0f} -> {result['rps']:.0f} requests/s"
+            )
+        if (
+            result["queries"] is not None
+            and base["queries"] is not None
+            and result["queries"] > base["queries"] + QUERY_SLACK
+        ):
+            regressions.append(
+                f"{scenario}: {base['queries']:.2f} -> {result['queries']:.2f} "
+                "queries per request"
+            )
+    return regressions
+
+
+def _delta(value, base):
+    if base is None or value is None or not base:
+        return ""
+    return f" ({(value - base) / base:+.0%})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare with results saved earlier.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    workload = Workload(args.seed)
+    if not workload.users:
+        parser.error("No benchmark data, run benchmarks/generate_data.py first.")
+    baseline = {}
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+
+    results = {}
+    print(
+        f"{'scenario':<12} {'req/s':>14} {'p50':>16} {'p95':>16} {'p99':>16} "
+        f"{'queries':>14} {'errors':>6}"
+    )
+    # Debug query logging would dominate the numbers
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=["testserver"]):
+        for scenario in args.scenarios:
+            result = run_scenario(
+                workload, scenario, args.requests, args.concurrency, args.warmup
+            )
+            results[scenario] = result
+            base = baseline.get(scenario, {})
+            queries = "-" if result["queries"] is None else f"{result['queries']:.2f}"
+            print(
+                f"{scenario:<12} "
+                f"{result['rps']:>6.0f}{_delta(result['rps'], base.get('rps')):>8} "
+                f"{result['p50']:>6.1f}ms{_delta(result['p50'], base.get('p50')):>8} "
+                f"{result['p95']:>6.1f}ms{_delta(result['p95'], base.get('p95')):>8} "
+                f"{result['p99']:>6.1f}ms{_delta(result['p99'], base.get('p99')):>8} "
+                f"{queries:>6}{_delta(result['queries'], base.get('queries')):>8} "
+                f"{result['errors']:>6}"
+            )
+
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps(
+                {
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "users": len(workload.users),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+    if args.baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare ReadingSerializer with the ReadingValuesSerializer fast path used by
+the readings list and retrieve actions.
+
+Rows are built in memory, so no database is needed:
+
+    python benchmarks/reading_serializers.py [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from Luna.models import Reading  # noqa: E402
+from Luna.seliarizers import ReadingSerializer, ReadingValuesSerializer  # noqa: E402
+
+
+def build_rows(size):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "hydroponic_system": i % 50 + 1,
+            "temperature": 20.0 + i % 7,
+            "ph": 6.0 + i % 3 / 10,
+            "tds": 500.0 + i % 11,
+            "timestamp": start + timedelta(seconds=i, microseconds=i % 1000),
+        }
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    request = APIRequestFactory().get("/api/readings/")
+    request.user = User(pk=1, username="bench")
+
+    print(
+        f"{'rows':>8} {'ReadingSerializer':>18} {'values fast path':>18} {'speedup':>8}"
+    )
+    for size in args.sizes:
+        rows = build_rows(size)
+        instances = [
+            Reading(
+                id=row["id"],
+                hydroponic_system_id=row["hydroponic_system"],
+                temperature=row["temperature"],
+                ph=row["ph"],
+                tds=row["tds"],
+                timestamp=row["timestamp"],
+            )
+            for row in rows
+        ]
+
+        drf = min(
+            timeit.repeat(
+                lambda: ReadingSerializer(
+                    instances, many=True, context={"request": request}
+                ).data,
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        fast = min(
+            timeit.repeat(
+                lambda: ReadingValuesSerializer(rows, many=True).data,
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(
+            f"{size:>8} {drf * 1000:>16.1f}ms {fast * 1000:>16.1f}ms {drf / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
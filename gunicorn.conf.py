@@ -0,0 +1,44 @@
+# Production server settings, see readme.md. Every value can be overridden
+# through the environment (.env-template lists them).
+import multiprocessing
+import os
+
+SERVER_INTERFACE = os.environ.get("SERVER_INTERFACE", "wsgi")
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+# Recycle workers now and then to contain slow memory growth
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 1000))
+accesslog = "-"
+
+# Cached readings, response versions, system owners and alert state are only
+# invalidated in the worker that wrote, so workers must share a cache
+if workers > 1 and not os.environ.get("REDIS_URL"):
+    raise RuntimeError(
+        f"WEB_WORKERS={workers} needs a shared cache, set REDIS_URL or run one "
+        "worker."
+    )
+
+# A local stream backend only sees the readings written by its own worker, so
+# streams would miss most of them
+if (
+    SERVER_INTERFACE == "asgi"
+    and workers > 1
+    and os.environ.get("READINGS_STREAM_BACKEND", "local") == "local"
+):
+    raise RuntimeError(
+        f"WEB_WORKERS={workers} needs READINGS_STREAM_BACKEND=postgres, or run "
+        "one worker."
+    )
+
+if SERVER_INTERFACE == "asgi":
+    wsgi_app = "main.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "main.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("WEB_THREADS", 4))
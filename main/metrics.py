@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "serializer_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+
+# Stats of the request being handled. Context variables follow the request
+# into sync_to_async threads, so async views are measured as well.
+current = ContextVar("request_stats", default=None)
+_serializing = ContextVar("serializing", default=False)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+# Every connection of every thread gets the wrapper once, when it connects
+def install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+# Adds the time spent in the block to the request's serializer time. Blocks
+# nested in another one, like serializers used by serializers, are not counted
+# twice.
+@contextmanager
+def timed_serialization():
+    stats = current.get()
+    if stats is None or _serializing.get():
+        yield
+        return
+    token = _serializing.set(True)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_seconds += time.perf_counter() - start
+        _serializing.reset(token)
+
+
+class TimedSerializerMixin:
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join(
+        '%s="%s"'
+        % (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+
+
+class Registry:
+    # Metrics of this process. Every worker process keeps its own, Prometheus
+    # tells them apart by their scrape target.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.durations = {}
+        self.queries = {}
+        self.totals = {}
+
+    def observe(self, method, route, status, seconds, stats):
+        with self.lock:
+            key = (method, route, status)
+            if key not in self.durations:
+                self.durations[key] = Histogram(LATENCY_BUCKETS)
+            self.durations[key].observe(seconds)
+            key = (method, route)
+            if key not in self.queries:
+                self.queries[key] = Histogram(QUERY_BUCKETS)
+                self.totals[key] = [0.0, 0.0]
+            self.queries[key].observe(stats.queries)
+            self.totals[key][0] += stats.db_seconds
+            self.totals[key][1] += stats.serializer_seconds
+
+    def _histogram(self, name, help_text, histograms, label_names):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(histograms.items()):
+            labels = _labels(**dict(zip(label_names, key)))
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    def render(self, token_cache_stats):
+        with self.lock:
+            lines = self._histogram(
+                "luna_http_request_duration_seconds",
+                "Request latency by route.",
+                self.durations,
+                ("method", "route", "status"),
+            )
+            lines += self._histogram(
+                "luna_http_request_queries",
+                "Database queries per request by route.",
+                self.queries,
+                ("method", "route"),
+            )
+            for index, (name, help_text) in enumerate(
+                [
+                    ("luna_http_request_db_seconds_total", "Time spent in queries."),
+                    (
+                        "luna_http_request_serializer_seconds_total",
+                        "Time spent in serializers.",
+                    ),
+                ]
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (method, route), totals in sorted(self.totals.items()):
+                    labels = _labels(method=method, route=route)
+                    lines.append(f"{name}{{{labels}}} {totals[index]}")
+
+        for name, metric_type, value in [
+            ("luna_token_cache_hits_total", "counter", token_cache_stats["hits"]),
+            ("luna_token_cache_misses_total", "counter", token_cache_stats["misses"]),
+            ("luna_token_cache_size", "gauge", token_cache_stats["size"]),
+        ]:
+            lines += [f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    # Records latency, query count, query time and serializer time of every
+    # request by route, and logs requests over METRICS_QUERY_BUDGET queries or
+    # METRICS_LATENCY_BUDGET_MS milliseconds (0 disables either budget)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        connection_created.connect(install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(None, connection)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def record(self, request, response, seconds, stats):
+        match = request.resolver_match
+        route = match.view_name if match is not None else "<unmatched>"
+        registry.observe(request.method, route, response.status_code, seconds, stats)
+
+        query_budget = settings.METRICS_QUERY_BUDGET
+        latency_budget = settings.METRICS_LATENCY_BUDGET_MS
+        if (query_budget and stats.queries > query_budget) or (
+            latency_budget and seconds * 1000 > latency_budget
+        ):
+            logger.warning(
+                "%s %s (%s) took %.1f ms with %d queries (%.1f ms), "
+                "%.1f ms in serializers",
+                request.method,
+                request.get_full_path(),
+                route,
+                seconds * 1000,
+                stats.queries,
+                stats.db_seconds * 1000,
+                stats.serializer_seconds * 1000,
+            )
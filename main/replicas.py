@@ -0,0 +1,115 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from rest_framework.permissions import SAFE_METHODS
+
+# Database alias reads go to, None for the primary. Only safe requests set it,
+# see ReplicaReadMixin, so writes and everything outside such requests, like
+# commands and the ingest pipeline, stay on the primary.
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def pin_key(user_id):
+    return f"luna:primary-pin:{user_id}"
+
+
+# Keeps the users' reads on the primary for REPLICA_STICKY_SECONDS after they
+# wrote, so they see their writes while the replicas catch up
+def pin(user_ids):
+    if settings.DATABASE_REPLICAS and settings.REPLICA_STICKY_SECONDS:
+        cache.set_many(
+            {pin_key(user_id): True for user_id in user_ids},
+            settings.REPLICA_STICKY_SECONDS,
+        )
+
+
+def _choose(pinned):
+    if pinned or not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+# The replica a safe request of the user reads from, None for the primary
+def read_alias(user_id):
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return _choose(user_id is not None and cache.get(pin_key(user_id)))
+
+
+async def aread_alias(user_id):
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return _choose(user_id is not None and await cache.aget(pin_key(user_id)))
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    # Explicit, or objects read from a replica would be saved back to it
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    # Migrations are left alone: only the primary is migrated by default, and
+    # the replicas' test databases need the schema too
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    # Safe requests read from a replica once authenticated, unless the user
+    # wrote within REPLICA_STICKY_SECONDS. Other requests pin the user to the
+    # primary. Querysets evaluated after the view returns, like streamed
+    # exports, must be bound with ``.using(queryset.db)`` in the view.
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self._read_alias_token = _read_alias.set(read_alias(request.user.pk))
+        elif request.user.is_authenticated:
+            self._writer_id = request.user.pk
+
+    # Reset here rather than in finalize_response, which unhandled exceptions
+    # skip
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            token = self.__dict__.pop("_read_alias_token", None)
+            if token is not None:
+                _read_alias.reset(token)
+            writer_id = self.__dict__.pop("_writer_id", None)
+            if writer_id is not None:
+                pin([writer_id])
+
+
+class ReplicaAdminMiddleware:
+    # ReplicaReadMixin for the admin site
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(reverse("admin:index")):
+            return self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if request.user.is_authenticated:
+                pin([request.user.pk])
+            return response
+        with reading_from(read_alias(request.user.pk)):
+            return self.get_response(request)
@@ -0,0 +1,85 @@
+import difflib
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+
+from api_auth.authentication import token_cache
+
+# Fixture sizes every budget is checked with. A budget holds for all of them,
+# so queries that grow with the number of related objects fail it.
+BUDGET_SIZES = (1, 10, 1000)
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "'?'"),
+    (re.compile(r"\b\d+(\.\d+)?\b"), "?"),
+    (re.compile(r"\(\?(, \?)*\)"), "(...)"),
+]
+
+
+def normalize_sql(sql):
+    for pattern, replacement in _LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class QueryBudgetMixin:
+    # Checks that a request runs at most ``budget`` queries at every size in
+    # BUDGET_SIZES. ``send(size)`` makes the request against the fixtures of
+    # that size, ``prepare(size)`` may create them first. Caches are cleared
+    # before every request, so budgets count the cold path. A failure lists
+    # the queries as a diff against the smallest size.
+    def assertQueryBudget(self, label, budget, send, prepare=None, sizes=BUDGET_SIZES):
+        captured = {}
+        for size in sizes:
+            if prepare is not None:
+                prepare(size)
+            cache.clear()
+            token_cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = send(size)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertLess(
+                response.status_code,
+                400,
+                f"{label} with {size}: {getattr(response, 'data', None)}",
+            )
+            captured[size] = [normalize_sql(query["sql"]) for query in queries]
+            if len(queries) > budget:
+                self.fail(self._budget_report(label, budget, captured, size))
+
+    def _budget_report(self, label, budget, captured, size):
+        lines = [
+            f"{label} ran {len(captured[size])} queries with {size} related "
+            f"objects, the budget is {budget}."
+        ]
+        smallest = min(captured)
+        if smallest == size:
+            lines += [f"{index}. {sql}" for index, sql in enumerate(captured[size], 1)]
+        else:
+            lines += difflib.unified_diff(
+                captured[smallest],
+                captured[size],
+                fromfile=f"{label} with {smallest}",
+                tofile=f"{label} with {size}",
+                lineterm="",
+            )
+        return "\n".join(lines)
+
+
+class TestRunner(DiscoverRunner):
+    # Replica routing is off in tests, even with POSTGRES_REPLICA_URLS set, as
+    # tests only may use the databases they list. Tests turn it on with
+    # override_settings(DATABASE_REPLICAS=[...]), see main.tests.ReplicaTests.
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.replicas_off = override_settings(DATABASE_REPLICAS=[])
+        self.replicas_off.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.replicas_off.disable()
+        super().teardown_test_environment(**kwargs)
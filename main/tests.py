@@ -0,0 +1,212 @@
+from datetime import datetime
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, router
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import make_aware
+from rest_framework.authtoken.models import Token
+
+from Luna.models import Reading
+from main import metrics, replicas
+
+
+class HealthCheckTests(TestCase):
+    def test_healthy(self):
+        response = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+    def test_database_unavailable(self):
+        with patch("main.views.connection.cursor", side_effect=DatabaseError):
+            response = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, 503)
+
+
+class MetricsTests(TestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.addCleanup(metrics.registry.clear)
+        cache.clear()
+        token = Token.objects.get(user__username="newuser")
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_records_route_latency_and_queries(self):
+        self.client.get("/api/systems/", **self.auth)
+        self.client.get("/api/systems/", **self.auth)
+        body = self.scrape()
+        labels = 'method="GET",route="hydroponic system-list"'
+        self.assertIn(
+            'luna_http_request_duration_seconds_count{%s,status="200"} 2' % labels,
+            body,
+        )
+        self.assertIn(f"luna_http_request_queries_count{{{labels}}} 2", body)
+        self.assertIn(f"luna_http_request_db_seconds_total{{{labels}}}", body)
+        self.assertIn("luna_token_cache_hits_total", body)
+
+    def test_counts_queries_of_request(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse("health"))
+            self.client.get(reverse("health"))
+        body = self.scrape()
+        self.assertIn(
+            'luna_http_request_queries_sum{method="GET",route="health"} 2', body
+        )
+
+    def test_records_serializer_time(self):
+        self.client.get("/api/systems/3/", **self.auth)
+        stats = metrics.registry.totals[("GET", "hydroponic system-detail")]
+        self.assertGreater(stats[1], 0)
+
+    def test_unmatched_route(self):
+        self.client.get("/no-such-page/")
+        self.assertIn('route="<unmatched>"', self.scrape())
+
+    @override_settings(METRICS_QUERY_BUDGET=1)
+    def test_logs_requests_over_query_budget(self):
+        with self.assertLogs("main.metrics", "WARNING") as logs:
+            self.client.get("/api/systems/", **self.auth)
+        self.assertIn("/api/systems/", logs.output[0])
+
+    @override_settings(METRICS_QUERY_BUDGET=10)
+    def test_requests_within_budget_are_not_logged(self):
+        with self.assertNoLogs("main.metrics", "WARNING"):
+            self.client.get(reverse("health"))
+
+    def test_restricted_to_allowed_addresses_and_staff(self):
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8"]):
+            response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.1.2.3")
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(reverse("metrics"), **self.auth)
+            self.assertEqual(response.status_code, 403)
+
+            self.client.force_login(get_user_model().objects.get(username="admin"))
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    def test_async_view_is_measured(self):
+        self.client.get("/api/readings/stream/")
+        body = self.scrape()
+        self.assertIn('route="reading-stream",status="501"', body)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a", "replica_b"])
+class ReplicaRouterTests(TestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.get(username="newuser")
+        token = Token.objects.get(user=self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+
+    def test_routing(self):
+        self.assertEqual(router.db_for_read(Reading), "default")
+        with replicas.reading_from("replica_a"):
+            self.assertEqual(router.db_for_read(Reading), "replica_a")
+            self.assertEqual(router.db_for_write(Reading), "default")
+        self.assertEqual(router.db_for_read(Reading), "default")
+
+    def test_pinned_after_write(self):
+        self.assertIn(replicas.read_alias(self.user.pk), ["replica_a", "replica_b"])
+        replicas.pin([self.user.pk])
+        self.assertIsNone(replicas.read_alias(self.user.pk))
+        self.assertIsNotNone(replicas.read_alias(None))
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertIsNone(replicas.read_alias(None))
+
+    def test_safe_requests_read_from_replicas(self):
+        seen = []
+
+        # The test database has no replica aliases, record the choice instead
+        def read_alias(user_id):
+            seen.append(user_id)
+            return None
+
+        with patch.object(replicas, "read_alias", read_alias):
+            self.client.get(reverse("reading-list"), **self.auth)
+            self.client.get(reverse("hydroponic system-detail", args=[3]), **self.auth)
+            self.client.post(
+                reverse("reading-list"),
+                {"hydroponic_system": 3, "temperature": 1.0, "ph": 1.0, "tds": 1.0},
+                **self.auth,
+            )
+        self.assertListEqual(seen, [self.user.pk, self.user.pk])
+        self.assertIsNone(replicas.read_alias(self.user.pk))
+
+
+# The replica databases, not routed to unless a test turns them on, see
+# main.testing.TestRunner
+REPLICA_ALIASES = [alias for alias in settings.DATABASES if alias != "default"]
+
+
+# Run with POSTGRES_REPLICA_URLS set. Every replica gets a test database of its
+# own, loaded with the same fixtures, and readings written to it alone tell
+# which database a request read from.
+@skipUnless(REPLICA_ALIASES, "POSTGRES_REPLICA_URLS is not set")
+class ReplicaTests(TransactionTestCase):
+    fixtures = ["Luna/fixtures/test.json"]
+    databases = {"default", *REPLICA_ALIASES}
+    # Users are loaded by natural key, the same ids on every database
+    reset_sequences = True
+
+    def setUp(self):
+        cache.clear()
+        token = Token.objects.get(user__username="newuser")
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+        self.replica = REPLICA_ALIASES[0]
+        # Only on the replica, bulk_create sends no signals
+        Reading.objects.using(self.replica).bulk_create(
+            [
+                Reading(
+                    hydroponic_system_id=3,
+                    temperature=42.0,
+                    ph=6.0,
+                    tds=1.0,
+                    timestamp=make_aware(datetime(2025, 3, 1)),
+                )
+            ]
+        )
+
+    def request(self, method, url, data=None):
+        with override_settings(DATABASE_REPLICAS=[self.replica]):
+            response = getattr(self.client, method)(url, data, **self.auth)
+            if response.streaming:
+                response.streamed = b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        return response
+
+    def temperatures(self, response):
+        return {reading["temperature"] for reading in response.json()["results"]}
+
+    def test_reads_go_to_replica_until_a_write(self):
+        response = self.request("get", reverse("reading-list"))
+        self.assertIn(42.0, self.temperatures(response))
+
+        self.request(
+            "post",
+            reverse("reading-list"),
+            {"hydroponic_system": 3, "temperature": 7.0, "ph": 1.0, "tds": 1.0},
+        )
+        temperatures = self.temperatures(self.request("get", reverse("reading-list")))
+        self.assertIn(7.0, temperatures)
+        self.assertNotIn(42.0, temperatures)
+
+    def test_streamed_export_reads_replica(self):
+        response = self.request("get", reverse("reading-export"), {"format": "csv"})
+        self.assertIn(b"42.0", response.streamed)
+
+    def test_async_views_read_replica(self):
+        response = self.request("get", reverse("async-reading-list"))
+        self.assertIn(42.0, self.temperatures(response))
@@ -19,9 +19,13 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularSwaggerView, SpectacularAPIView
 
+from main.views import health, metrics
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("healthz/", health, name="health"),
+    path("metrics", metrics, name="metrics"),
     path("api-auth/", include("api_auth.urls")),
     path("api/", include("Luna.urls")),
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
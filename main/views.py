@@ -0,0 +1,45 @@
+import ipaddress
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+
+from api_auth.authentication import token_cache
+from main.metrics import registry
+
+
+# Liveness and readiness probe for the container and load balancers
+def health(request):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError:
+        return JsonResponse({"status": "unavailable"}, status=503)
+    return JsonResponse({"status": "ok"})
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+# Prometheus text exposition of the metrics recorded by main.metrics, for
+# METRICS_ALLOWED_IPS and staff only. Route timings and the token cache stats
+# are no business of API users.
+def metrics(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(token_cache.stats()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )